@@ -0,0 +1,35 @@
+# ASGI counterpart of uwsgi.ini: gunicorn managing uvicorn workers that run
+# moreview.asgi:application. Needs `pip install gunicorn uvicorn`, then
+#
+#     gunicorn -c gunicorn.conf.py
+#
+# moreview/asgi.py turns on the in-process connection pool (DATABASE_POOL_SIZE)
+# before Django loads. Set ASYNC_VIEWS=1 in raw_env to try the async read
+# views, which await their queries one after another on one connection.
+#
+# To compare throughput per core with uWSGI, keep both at one worker process,
+# pin each to the same core and load the same pages over HTTP, one server at
+# a time, e.g.
+#
+#     taskset -c 0 uwsgi --ini uwsgi.ini --http :9001
+#     wrk -t2 -c64 -d30s http://127.0.0.1:9001/movies/1
+#
+#     taskset -c 0 gunicorn -c gunicorn.conf.py
+#     wrk -t2 -c64 -d30s http://127.0.0.1:9000/movies/1
+#
+# Like uwsgi.ini this is a single worker, which also keeps the local memory
+# caches (sessions, pages, fragments) consistent; raise `workers` only after
+# moving those caches to a shared backend.
+
+wsgi_app = "moreview.asgi:application"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = 1
+bind = ":9000"
+
+# same recycling as uWSGI's max-requests, spread out so workers restart apart
+max_requests = 5000
+max_requests_jitter = 500
+
+raw_env = ["DJANGO_SETTINGS_MODULE=moreview.production_settings"]
+
+errorlog = "/var/log/gunicorn/error.log"
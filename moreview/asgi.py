@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "moreview.settings")
 
+# Each ASGI request runs its sync code on a new thread, where the persistent
+# connections of CONN_MAX_AGE are never reused; share a pool between threads.
+# DATABASE_POOL_SIZE=0 turns it off.
+os.environ.setdefault("DATABASE_POOL_SIZE", "10")
+
 application = get_asgi_application()
@@ -0,0 +1,69 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .asyncviews import aload_user
+
+
+class ConditionalGetMixin:
+    """Answer conditional GETs with 304 before the view runs its queries.
+
+    `get_validator()` returns a list of values that change whenever the page
+    would, or None to skip the check. The ETag also covers the user, their
+    session and the language; it is weak because the rendered CSRF token
+    differs between two renders of the same data. There is no Last-Modified:
+    the content timestamps cannot tell a page apart from the same page for
+    another user or language.
+    Async views run the validator on a thread.
+    """
+
+    def get_validator(self):
+        raise NotImplementedError
+
+    def get_etag(self, parts):
+        parts = [*parts, self.request.user.pk, translation.get_language()]
+        if self.request.user.is_authenticated:
+            # a new login rotates the CSRF token that the page's forms carry
+            parts.append(self.request.session.session_key)
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        return f'W/"{digest}"'
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.conditional_adispatch(request, *args, **kwargs)
+        if request.method not in ("GET", "HEAD"):
+            return super().dispatch(request, *args, **kwargs)
+        validator = self.get_validator()
+        if validator is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        etag = self.get_etag(validator)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return self.patch_response(response, etag)
+
+    async def conditional_adispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return await super().dispatch(request, *args, **kwargs)
+        await aload_user(request)
+        validator = await sync_to_async(self.get_validator)()
+        if validator is None:
+            return await super().dispatch(request, *args, **kwargs)
+
+        etag = self.get_etag(validator)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await super().dispatch(request, *args, **kwargs)
+        return self.patch_response(response, etag)
+
+    def patch_response(self, response, etag):
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            # revalidate every time instead of a heuristic freshness
+            patch_cache_control(response, no_cache=True)
+            if self.request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+        return response
@@ -0,0 +1,107 @@
+"""PostgreSQL backend that keeps closed connections in an in-process pool.
+
+Under ASGI every request runs its sync code on a thread of its own, so the
+thread-local persistent connections of CONN_MAX_AGE are never reused. With
+this backend Django still closes the connection at the end of each request,
+but the close hands it back to a pool shared by all threads and the next
+request takes it from there instead of connecting again.
+
+Set POOL_SIZE in the database settings to the number of idle connections to
+keep; connections opened beyond it are closed when given back.
+"""
+
+import queue
+import threading
+
+from django.db.backends.postgresql import base
+
+
+class ConnectionPool:
+    def __init__(self, size):
+        self.idle = queue.LifoQueue(maxsize=size)
+
+    def take(self, health_check):
+        """Return an idle (connection, isolation level) pair, or None."""
+        while True:
+            try:
+                connection, isolation_level = self.idle.get_nowait()
+            except queue.Empty:
+                return None
+            if not connection.closed and (
+                not health_check or self.is_usable(connection)
+            ):
+                return connection, isolation_level
+            self.discard(connection)
+
+    def give_back(self, connection, isolation_level):
+        try:
+            # leave nothing of the last request's transaction behind
+            connection.rollback()
+            self.idle.put_nowait((connection, isolation_level))
+        except (base.Database.Error, queue.Full):
+            self.discard(connection)
+
+    def is_usable(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            # outside autocommit the ping opened a transaction
+            connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except base.Database.Error:
+            pass
+
+    def clear(self):
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self.discard(connection)
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(settings_dict):
+    key = tuple(settings_dict.get(name) for name in ("HOST", "PORT", "NAME", "USER"))
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(settings_dict.get("POOL_SIZE") or 10)
+        return pools[key]
+
+
+class DatabaseCreation(base.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # idle pooled connections would keep the database from being dropped
+        with pools_lock:
+            for key, pool in pools.items():
+                if key[2] == test_database_name:
+                    pool.clear()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    # not `pool`, which Django 5.1+ uses for its own psycopg pool
+    def get_idle_pool(self):
+        return get_pool(self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        pooled = self.get_idle_pool().take(self.settings_dict["CONN_HEALTH_CHECKS"])
+        if pooled is None:
+            return super().get_new_connection(conn_params)
+        connection, self.isolation_level = pooled
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            self.get_idle_pool().give_back(self.connection, self.isolation_level)
@@ -0,0 +1,133 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Names starting with a content hash never change, see movie/storage.py
+IMMUTABLE_NAME_RE = re.compile(r"^[0-9a-f]{64}")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=86400"
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """Return the (start, end) of a single byte range header, end inclusive.
+
+    Returns None when the whole file should be sent, which is allowed for
+    headers we do not understand such as multiple ranges, and raises
+    ValueError when the range lies outside the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # the last `end` bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded file, or hand it to the front proxy to send.
+
+    MEDIA_SENDFILE picks who copies the bytes: "x-accel" answers with an
+    X-Accel-Redirect to MEDIA_ACCEL_PREFIX for an nginx internal location,
+    "x-sendfile" with the file path for Apache/lighttpd/uWSGI, and None
+    streams the file from Django, which is only meant for development.
+    Conditional requests are answered here in every mode; byte ranges are
+    left to the proxy when it sends the file.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    immutable = IMMUTABLE_NAME_RE.match(posixpath.basename(path))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Cache-Control": (
+            IMMUTABLE_CACHE_CONTROL if immutable else DEFAULT_CACHE_CONTROL
+        ),
+    }
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    sendfile = settings.MEDIA_SENDFILE
+    if sendfile:
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if sendfile == "x-accel":
+            prefix = settings.MEDIA_ACCEL_PREFIX.rstrip("/")
+            response["X-Accel-Redirect"] = f"{prefix}/{quote(path)}"
+        else:
+            response["X-Sendfile"] = full_path
+        return response
+
+    headers["Accept-Ranges"] = "bytes"
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if "Range" in request.headers and if_range in (None, etag):
+        try:
+            byte_range = parse_range(request.headers["Range"], stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416, headers=headers)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+
+    start, end = byte_range or (0, stat.st_size - 1)
+    length = end - start + 1 if stat.st_size else 0
+    response = StreamingHttpResponse(
+        read_range(full_path, start, length),
+        status=206 if byte_range else 200,
+        content_type=content_type,
+        headers=headers,
+    )
+    response["Content-Length"] = length
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return response
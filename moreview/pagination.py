@@ -0,0 +1,148 @@
+import base64
+import binascii
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Seek pagination over a single ordering field with an id tie-breaker.
+
+    Instead of an OFFSET, each page continues after the (field, id) values of
+    the last row of the previous page, so every page costs the same no matter
+    how deep it is. The cursor handed to the client is an opaque string.
+    """
+
+    def __init__(self, queryset, ordering, per_page, tie_breaker="id"):
+        self.queryset = queryset
+        self.descending = ordering.startswith("-")
+        self.field_name = ordering.lstrip("-")
+        self.tie_breaker = tie_breaker
+        self.per_page = per_page
+
+        self.fields = [
+            self.resolve_field(self.field_name),
+            self.resolve_field(tie_breaker),
+        ]
+
+    def resolve_field(self, name):
+        """Return the model field or annotation output field called `name`."""
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.queryset.query.annotations[name].output_field
+
+    def get_names(self):
+        return [self.field_name, self.tie_breaker]
+
+    def get_ordering(self):
+        prefix = "-" if self.descending else ""
+        return [prefix + self.field_name, prefix + self.tie_breaker]
+
+    def encode_cursor(self, obj):
+        values = [
+            # Annotations are not attached to the model, so use their raw value
+            (
+                field.value_to_string(obj)
+                if getattr(field, "model", None)
+                else getattr(obj, name)
+            )
+            for name, field in zip(self.get_names(), self.fields)
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Return the (field, id) values of a cursor, or None if it is invalid."""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                return None
+            return [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    def seek_filter(self, values):
+        value, tie = values
+        lookup = "lt" if self.descending else "gt"
+        return Q(**{f"{self.field_name}__{lookup}": value}) | Q(
+            **{self.field_name: value, f"{self.tie_breaker}__{lookup}": tie}
+        )
+
+    def get_page_queryset(self, cursor):
+        queryset = self.queryset.order_by(*self.get_ordering())
+        values = self.decode_cursor(cursor) if cursor else None
+        if values is not None:
+            queryset = queryset.filter(self.seek_filter(values))
+        # one extra row tells whether there is a next page
+        return queryset[: self.per_page + 1]
+
+    def get_page(self, cursor=None):
+        """Return the page after `cursor`; a missing or invalid cursor starts over."""
+        return self.make_page(list(self.get_page_queryset(cursor)))
+
+    async def aget_page(self, cursor=None):
+        return self.make_page([obj async for obj in self.get_page_queryset(cursor)])
+
+    def make_page(self, object_list):
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[: self.per_page]
+            next_cursor = self.encode_cursor(object_list[-1])
+        return KeysetPage(object_list, next_cursor)
+
+
+class KeysetPaginationMixin:
+    """ListView pagination with the paginator of `get_keyset_paginator()`.
+
+    When that returns None the view falls back to ListView's offset pages.
+    """
+
+    def get_keyset_paginator(self, queryset, page_size):
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_keyset_paginator(queryset, page_size)
+        if paginator is None:
+            return super().paginate_queryset(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get("cursor"))
+        return None, page, page.object_list, page.has_next
+
+    async def apaginate_queryset(self, queryset, page_size):
+        paginator = self.get_keyset_paginator(queryset, page_size)
+        if paginator is None:
+            # Paginator counts and slices synchronously
+            return await sync_to_async(super().paginate_queryset)(queryset, page_size)
+        page = await paginator.aget_page(self.request.GET.get("cursor"))
+        return None, page, page.object_list, page.has_next
+
+
+class PaginationQueryMixin:
+    """Expose the current query string without its page/cursor to templates."""
+
+    pagination_params = ["page", "cursor"]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        for param in self.pagination_params:
+            params.pop(param, None)
+        context["pagination_query"] = params.urlencode()
+        return context
@@ -0,0 +1,47 @@
+"""
+Production settings for moreview, on top of moreview/settings.py.
+
+uwsgi.ini points DJANGO_SETTINGS_MODULE here. Run
+`python manage.py check_production` after collectstatic; it fails the deploy
+when one of the settings below that keep workers fast and small is missing,
+or when DATABASE_CONN_MAX_AGE=0 turned off the persistent connections that
+settings.py keeps by default.
+"""
+
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import SECRET_KEY, STORAGES, TEMPLATES
+
+# With DEBUG on, every executed query is kept in connection.queries, which
+# grows the worker until uwsgi recycles it
+DEBUG = False
+
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", SECRET_KEY)
+
+ALLOWED_HOSTS = os.environ.get("DJANGO_ALLOWED_HOSTS", "127.0.0.1,localhost").split(",")
+
+# Parse each template once per process instead of reading it from disk on
+# every render
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]["APP_DIRS"] = False
+TEMPLATES[0]["OPTIONS"]["loaders"] = [
+    (
+        "django.template.loaders.cached.Loader",
+        [
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ],
+    ),
+]
+
+# settings.py picks these from its own DEBUG
+STORAGES = {
+    **STORAGES,
+    "staticfiles": {
+        "BACKEND": "moreview.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+MEDIA_SENDFILE = "x-accel"
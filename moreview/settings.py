@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "crispy_forms",
     "crispy_bootstrap5",
     "movie",
@@ -49,6 +51,27 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Number of movies on one page of the homepage and the manage list
+MOVIE_LIST_PAGE_SIZE = 12
+
+# Number of reports on one page of the report lists
+REPORT_LIST_PAGE_SIZE = 20
+
+# Seconds a moderator holds a claimed report before it returns to the queue
+REPORT_CLAIM_LEASE = 600
+
+# Number of users on one page of the admin user list
+USER_LIST_PAGE_SIZE = 50
+
+# Movie search backend; MemorySearchBackend keeps an in-process n-gram index,
+# which is much faster than a LIKE scan on SQLite
+MOVIE_SEARCH_BACKEND = "movie.search.DatabaseSearchBackend"
+
+# Route the movie list and detail and the report list to their async views.
+# Their queries still run one after another on the request's connection, so
+# they only spare the ASGI event loop the wait; see moreview/asyncviews.py
+ASYNC_VIEWS = bool(int(os.environ.get("ASYNC_VIEWS", 0)))
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -86,17 +109,74 @@ WSGI_APPLICATION = "moreview.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Idle connections kept by the in-process pool, 0 turns the pool off. The
+# ASGI entry point turns it on, see moreview/asgi.py and moreview/dbpool.
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 0))
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "HOST": "postgres",
-        "PORT": 5432,
-        "NAME": "django",
-        "USER": "django",
-        "PASSWORD": "secret",
+        "ENGINE": (
+            "moreview.dbpool" if DATABASE_POOL_SIZE else "django.db.backends.postgresql"
+        ),
+        "HOST": os.environ.get("DATABASE_HOST", "postgres"),
+        "PORT": int(os.environ.get("DATABASE_PORT", 5432)),
+        "NAME": os.environ.get("DATABASE_NAME", "django"),
+        "USER": os.environ.get("DATABASE_USER", "django"),
+        "PASSWORD": os.environ.get("DATABASE_PASSWORD", "secret"),
+        # Keep the connection open across requests instead of connecting on
+        # each one; pooled connections go back to the pool after every request
+        "CONN_MAX_AGE": (
+            0
+            if DATABASE_POOL_SIZE
+            else int(os.environ.get("DATABASE_CONN_MAX_AGE", 600))
+        ),
+        # Ping a reused connection once per request before the first query,
+        # so a database restart costs a reconnect rather than a 500
+        "CONN_HEALTH_CHECKS": True,
+        "POOL_SIZE": DATABASE_POOL_SIZE,
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Rendered per-movie template fragments, see movie/fragments.py
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+    # Whole pages for anonymous visitors, see movie/pagecache.py
+    "pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pages",
+        "TIMEOUT": 600,
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+    # Sessions read through this cache, see SESSION_ENGINE below
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sessions",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Sessions
+# https://docs.djangoproject.com/en/4.1/topics/http/sessions/#using-cached-sessions
+
+# Writes go to the database and the cache, reads hit the database only on a
+# cache miss. The local memory cache is per process, which is right for the
+# single uwsgi process; use a shared cache before running several workers.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+SESSION_CACHE_ALIAS = "sessions"
+
+# Rows deleted per statement by the clear_expired_sessions command
+SESSION_CLEAR_BATCH_SIZE = 1000
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -139,6 +219,22 @@ STATICFILES_DIRS = [
     BASE_DIR / "templates/static",
 ]
 
+# Outside DEBUG, collectstatic writes content-hashed names plus .gz/.br
+# siblings of the text assets, which the front proxy serves with a far
+# future expiry
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "moreview.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -150,6 +246,13 @@ LOGIN_REDIRECT_URL = reverse_lazy("movie:list")
 
 LOGOUT_REDIRECT_URL = reverse_lazy("movie:list")
 
-MEDIA_URL = "/"
+MEDIA_URL = "/media/"
 
 MEDIA_ROOT = BASE_DIR / "static/images/"
+
+# How moreview.media.serve_media hands files to the front proxy: None streams
+# them from Django, "x-accel" redirects nginx to an internal location at
+# MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT, "x-sendfile" sends the file path
+MEDIA_SENDFILE = None if DEBUG else "x-accel"
+
+MEDIA_ACCEL_PREFIX = "/protected-media/"
@@ -0,0 +1,52 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz and .br next to each text asset.
+
+    The hashed names never change content, so the front proxy can serve the
+    precompressed siblings (nginx gzip_static/brotli_static) with a far
+    future expiry instead of compressing on every request. Brotli files are
+    only written when the brotli package is installed.
+    """
+
+    compress_extensions = (".css", ".js", ".map", ".svg", ".txt", ".json")
+    # smaller files do not gain anything worth the extra request headers
+    compress_min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # only the final names, the passes before may yield intermediate ones
+        for name, hashed_name in self.hashed_files.items():
+            for compressed in self.compress(hashed_name):
+                yield name, compressed, True
+
+    def compress(self, name):
+        if not name.endswith(self.compress_extensions):
+            return
+        with self.open(name) as file:
+            content = file.read()
+        if len(content) < self.compress_min_size:
+            return
+
+        encoders = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            encoders.append((".br", brotli.compress))
+        for extension, encode in encoders:
+            compressed = encode(content)
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self._save(name + extension, ContentFile(compressed))
+            yield name + extension
@@ -16,9 +16,10 @@ Including another URLconf
 # from django.contrib import admin
 from django.urls import path, include
 from django.views.generic.base import TemplateView
-from django.conf.urls.static import static
 from django.conf import settings
 
+from moreview.media import serve_media
+
 from review.views import (
     ReviewCreateView,
     # ReviewCreate
@@ -33,4 +34,7 @@ urlpatterns = [
     # path("admin/", admin.site.urls),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Posters go through serve_media, which hands them to the proxy outside DEBUG
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name="media"),
+]
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MovieConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "movie"
+
+    def ready(self):
+        # register the signal receivers
+        from . import fragments, pagecache, search  # noqa: F401
@@ -4,7 +4,8 @@ from crispy_forms.layout import Layout
 from django import forms
 from django.utils.translation import gettext as _
 
-from movie.models import Movie
+from movie.models import Movie, PosterBlob
+from movie.posters import delete_variants, generate_variants
 
 
 class MovieModelForm(forms.ModelForm):
@@ -37,3 +38,20 @@ class MovieModelForm(forms.ModelForm):
         widgets = {
             "date_released": forms.TextInput(attrs={"type": "date"}),
         }
+
+    def save(self, commit=True):
+        old_image = self.initial.get("image")
+        movie = super().save(commit)
+        if commit and "image" in self.changed_data:
+            PosterBlob.acquire(movie.image.name)
+            if old_image:
+                PosterBlob.release(old_image.name)
+            self.save_poster_variants(movie)
+        return movie
+
+    def save_poster_variants(self, movie):
+        # resize once at upload instead of sending the original to every visitor
+        old_variants = movie.poster_variants
+        movie.poster_variants = generate_variants(movie.image.name)
+        movie.save(update_fields=["poster_variants"])
+        delete_variants(old_variants)
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from reports.models import Report
+from review.models import Review
+
+from .models import Movie, Tag
+
+# Cache alias and names of the {% cache %} fragments rendered for each movie
+FRAGMENT_CACHE = "fragments"
+MOVIE_FRAGMENTS = ["movie_card", "movie_header"]
+
+
+def fragment_keys(movie_id, date_updated):
+    """Return the cache keys of every fragment of a movie, in every language."""
+    languages = {code for code, _ in settings.LANGUAGES} | {settings.LANGUAGE_CODE}
+    return [
+        make_template_fragment_key(fragment, [movie_id, date_updated, language])
+        for fragment in MOVIE_FRAGMENTS
+        for language in languages
+    ]
+
+
+def invalidate_movies(movies):
+    """Drop the cached fragments of the (id, date_updated) pairs in `movies`."""
+    keys = [key for movie in movies for key in fragment_keys(*movie)]
+    if not keys:
+        return
+    fragment_cache = caches[FRAGMENT_CACHE]
+    fragment_cache.delete_many(keys)
+    # a request may have cached the old rows again before the commit
+    transaction.on_commit(lambda: fragment_cache.delete_many(keys))
+
+
+def invalidate_queryset(queryset):
+    invalidate_movies(queryset.values_list("id", "date_updated"))
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_movie(sender, instance, **kwargs):
+    # rating updates save the aggregates without touching date_updated
+    invalidate_movies([(instance.id, instance.date_updated)])
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    invalidate_queryset(Movie.objects.filter(tag_id=instance.id))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review(sender, instance, **kwargs):
+    if Review.movie.is_cached(instance):
+        # the review services hand over the movie row they locked
+        invalidate_movies([(instance.movie.id, instance.movie.date_updated)])
+    else:
+        invalidate_queryset(Movie.objects.filter(id=instance.movie_id))
+
+
+@receiver(post_save, sender=Report)
+def invalidate_report(sender, instance, **kwargs):
+    invalidate_queryset(Movie.objects.filter(review=instance.review_id))
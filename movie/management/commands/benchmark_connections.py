@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a run of simulated requests, one small query each, with a new "
+        "database connection per request, with persistent connections and, on "
+        "PostgreSQL, with the in-process pool. Works against SQLite too, where "
+        "connecting is cheap and the difference small."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        settings_dict = connections[options["database"]].settings_dict
+        modes = {
+            "connection per request": {"CONN_MAX_AGE": 0},
+            "persistent": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+        }
+        if connections[options["database"]].vendor == "postgresql":
+            modes["pooled"] = {
+                "ENGINE": "moreview.dbpool",
+                "CONN_MAX_AGE": 0,
+                "CONN_HEALTH_CHECKS": True,
+                "POOL_SIZE": 1,
+            }
+
+        timings = {}
+        for name, overrides in modes.items():
+            wrapper = self.get_wrapper(
+                {**settings_dict, **overrides}, options["database"]
+            )
+            timings[name], opened = self.benchmark(wrapper, options["requests"])
+            self.stdout.write(
+                f"{name}: {timings[name]:.3f} ms per request, "
+                f"{opened} connections opened"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("summary"))
+        baseline = timings["connection per request"]
+        for name, timing in timings.items():
+            self.stdout.write(f"{name}: {baseline / max(timing, 1e-6):.1f}x")
+
+    def get_wrapper(self, settings_dict, alias):
+        backend = load_backend(settings_dict["ENGINE"])
+        # connection_created receivers look the alias up in django.db.connections
+        return backend.DatabaseWrapper(settings_dict, alias=alias)
+
+    def benchmark(self, wrapper, request_count):
+        # keep the connection objects alive so their ids are not reused
+        opened = {}
+        start = time.perf_counter()
+        for _ in range(request_count):
+            # what the request_started and request_finished signals do
+            wrapper.close_if_unusable_or_obsolete()
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            opened.setdefault(id(wrapper.connection), wrapper.connection)
+            wrapper.close_if_unusable_or_obsolete()
+        elapsed = time.perf_counter() - start
+        wrapper.close()
+        if hasattr(wrapper, "get_idle_pool"):
+            wrapper.get_idle_pool().clear()
+        return elapsed * 1000 / request_count, len(opened)
@@ -0,0 +1,183 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from movie.factories import MovieFactory, TagFactory
+from movie.models import Movie
+from reports.models import Report
+from review.models import Heart, Review
+from users.factories import UserFactory
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large dataset with the factories and print the EXPLAIN plan and "
+        "timing of the hot queries without and with the model indexes. "
+        "Everything runs in one transaction that is rolled back at the end; the "
+        "index drops lock the tables, so run it against a staging database."
+    )
+
+    models = [Movie, Review, Heart, Report]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movies", type=int, default=500)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--reviews", type=int, default=40, help="per movie")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        try:
+            with transaction.atomic():
+                self.seed(options["movies"], options["users"], options["reviews"])
+                self.drop_indexes()
+                before = self.benchmark("before: without indexes")
+                self.create_indexes()
+                after = self.benchmark("after: with indexes")
+                self.summarize(before, after)
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write("Seeded rows and index changes have been rolled back")
+
+    def seed(self, movie_count, user_count, reviews_per_movie):
+        self.stdout.write("Seeding...")
+        tag = TagFactory().create()
+
+        user_data = UserFactory().data
+        users = User.objects.bulk_create(
+            User(
+                **{
+                    **user_data,
+                    "username": f"benchmark-{index}",
+                    "email": f"benchmark-{index}@example.com",
+                }
+            )
+            for index in range(user_count)
+        )
+
+        movies = []
+        for index in range(movie_count):
+            data = MovieFactory().data
+            data["name"] = data["name"][: Movie._meta.get_field("name").max_length]
+            # Leave some movies without an uploaded poster, like the real table
+            if index % 5:
+                data["image"] = f"movies/{data['image']}"
+            movies.append(Movie(tag_id=tag, **data))
+        movies = Movie.objects.bulk_create(movies)
+
+        reviews = Review.objects.bulk_create(
+            Review(
+                user=random.choice(users),
+                movie=movie,
+                rating=random.randint(1, 5),
+                content="benchmark",
+            )
+            for movie in movies
+            for _ in range(reviews_per_movie)
+        )
+
+        hearts = []
+        reports = []
+        for review in reviews:
+            for user in random.sample(users, random.randint(0, min(3, len(users)))):
+                hearts.append(Heart(user=user, review=review))
+            if random.random() < 0.05:
+                reports.append(
+                    Report(
+                        user=random.choice(users),
+                        review=review,
+                        content="benchmark",
+                        status=random.choice([0, 1, 2, 3]),
+                    )
+                )
+        Heart.objects.bulk_create(hearts)
+        Report.objects.bulk_create(reports)
+
+        # PostgreSQL refuses to alter tables with pending deferred FK checks
+        connection.check_constraints()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        self.movie_id = movies[0].id
+        self.user_id = users[0].id
+        self.review_id = reviews[0].id
+        self.stdout.write(
+            f"Seeded {len(movies)} movies, {len(users)} users, {len(reviews)} "
+            f"reviews, {len(hearts)} hearts and {len(reports)} reports"
+        )
+
+    def get_queries(self):
+        reviews = Review.objects.filter(movie_id=self.movie_id, existed=False)
+        return {
+            "homepage": Movie.objects.filter(image__contains="movies/").order_by(
+                "-date_released", "-id"
+            )[:12],
+            "manage list": Movie.objects.order_by("-date_created", "-id")[:12],
+            "reviews latest": reviews.order_by("-date_created", "-id")[:10],
+            "reviews heart": reviews.order_by("-heart_count", "-id")[:10],
+            "reviews rating": reviews.order_by("-rating", "-id")[:10],
+            "user reports": Report.objects.filter(user_id=self.user_id).order_by(
+                "-date_updated"
+            ),
+            "report queue": Report.objects.filter(status=Report.UNDERPROCESS).order_by(
+                "-date_updated"
+            )[:20],
+            "heart lookup": Heart.objects.filter(
+                user_id=self.user_id, review_id=self.review_id
+            ),
+        }
+
+    def benchmark(self, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        timings = {}
+        for name, queryset in self.get_queries().items():
+            best = None
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best * 1000
+            self.stdout.write(f"{name}: {timings[name]:.2f} ms")
+            self.stdout.write(queryset.explain())
+        return timings
+
+    def get_indexes(self):
+        for model in self.models:
+            for index in model._meta.indexes:
+                yield model, index
+            # SQLite keeps unique constraints in the table definition, where they
+            # cannot be dropped without rebuilding the table
+            if connection.vendor == "sqlite":
+                continue
+            for constraint in model._meta.constraints:
+                yield model, constraint
+
+    def drop_indexes(self):
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model, index in self.get_indexes():
+                cursor.execute(str(index.remove_sql(model, editor)))
+
+    def create_indexes(self):
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model, index in self.get_indexes():
+                cursor.execute(str(index.create_sql(model, editor)))
+            cursor.execute("ANALYZE")
+
+    def summarize(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING("summary (ms)"))
+        for name in before:
+            self.stdout.write(
+                f"{name}: {before[name]:.2f} -> {after[name]:.2f} "
+                f"({before[name] / max(after[name], 1e-6):.1f}x)"
+            )
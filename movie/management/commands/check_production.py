@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.app_directories import Loader as AppDirectoriesLoader
+from django.template.loaders.cached import Loader as CachedLoader
+from django.template.loaders.filesystem import Loader as FilesystemLoader
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the settings that keep production workers fast and small, and "
+        "exit with an error when one is missing so the deploy stops. Run it "
+        "after collectstatic with the production settings module."
+    )
+
+    def handle(self, *args, **options):
+        problems = [
+            *self.check_debug(),
+            *self.check_template_loaders(),
+            *self.check_static_storage(),
+            *self.check_connections(),
+        ]
+        for problem in problems:
+            self.stderr.write(f"- {problem}")
+        if problems:
+            raise CommandError(f"{len(problems)} production settings are missing")
+        self.stdout.write(self.style.SUCCESS("Production settings look right"))
+
+    def check_debug(self):
+        if settings.DEBUG:
+            yield "DEBUG is on, every query is kept in connection.queries"
+
+    def check_template_loaders(self):
+        for engine in engines.all():
+            if not isinstance(engine, DjangoTemplates):
+                continue
+            loaders = engine.engine.template_loaders
+            if len(loaders) != 1 or not isinstance(loaders[0], CachedLoader):
+                yield f"templates of {engine.name!r} are not loaded by the cached loader"
+                continue
+            for loader_class in (FilesystemLoader, AppDirectoriesLoader):
+                if not any(
+                    isinstance(loader, loader_class) for loader in loaders[0].loaders
+                ):
+                    yield (
+                        f"the cached loader of {engine.name!r} does not wrap "
+                        f"{loader_class.__module__}.Loader"
+                    )
+
+    def check_static_storage(self):
+        if not isinstance(staticfiles_storage, ManifestFilesMixin):
+            yield "static files are not stored under hashed names by a manifest storage"
+        elif staticfiles_storage.read_manifest() is None:
+            yield "the static files manifest is missing, run collectstatic first"
+
+    def check_connections(self):
+        for connection in connections.all():
+            settings_dict = connection.settings_dict
+            if (
+                settings_dict["ENGINE"] != "moreview.dbpool"
+                and settings_dict["CONN_MAX_AGE"] == 0
+            ):
+                yield f"database {connection.alias!r} connects on every request"
+            if not settings_dict["CONN_HEALTH_CHECKS"]:
+                yield f"database {connection.alias!r} has no connection health checks"
@@ -0,0 +1,115 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from movie.models import Movie, PosterBlob
+from movie.posters import VARIANTS_DIR
+from movie.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete poster files no movie uses any more: blobs whose reference "
+        "count dropped to zero after an edit or delete, untracked files and "
+        "stale resized variants. Files younger than --min-age are kept so "
+        "uploads in progress are not collected."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age", type=int, default=3600, help="in seconds, default 3600"
+        )
+        parser.add_argument(
+            "--rehash",
+            action="store_true",
+            help="Move posters uploaded before content addressing to hashed names",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        self.storage = Movie._meta.get_field("image").storage
+        self.dry_run = options["dry_run"]
+        self.cutoff = timezone.now() - timedelta(seconds=options["min_age"])
+        self.freed = 0
+        self.removed = set()
+
+        if options["rehash"]:
+            self.rehash()
+
+        fixed = 0 if self.dry_run else PosterBlob.reconcile()
+        if fixed:
+            self.stdout.write(f"Repaired {fixed} reference counts")
+
+        used = set(
+            Movie.objects.exclude(image="").values_list("image", flat=True).distinct()
+        )
+        for movie in Movie.objects.only("image", "poster_variants"):
+            for variants in movie.poster_variants.get("variants", {}).values():
+                used.update(variant["name"] for variant in variants)
+
+        kept = set()
+        for blob in PosterBlob.objects.all():
+            if blob.ref_count or blob.name in used or blob.date_updated >= self.cutoff:
+                kept.add(blob.name)
+                continue
+            self.remove(blob.name)
+            if not self.dry_run:
+                PosterBlob.objects.filter(pk=blob.pk, ref_count=0).delete()
+
+        # files no blob tracks, e.g. stale variants or pre-refcount uploads
+        for directory in ["movies", VARIANTS_DIR]:
+            if not self.storage.exists(directory):
+                continue
+            for filename in self.storage.listdir(directory)[1]:
+                name = posixpath.join(directory, filename)
+                if name not in used and name not in kept and self.is_old(name):
+                    self.remove(name)
+
+        verb = "Would remove" if self.dry_run else "Removed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {len(self.removed)} files, {self.freed / 1024 / 1024:.1f} MB"
+            )
+        )
+
+    def is_old(self, name):
+        return self.storage.get_modified_time(name) < self.cutoff
+
+    def remove(self, name):
+        if name in self.removed or not self.storage.exists(name):
+            return
+        self.removed.add(name)
+        self.freed += self.storage.size(name)
+        self.stdout.write(f"{'would remove' if self.dry_run else 'remove'} {name}")
+        if not self.dry_run:
+            self.storage.delete(name)
+
+    def rehash(self):
+        """Point movies at the content-addressed copy of their poster."""
+        legacy = [
+            movie
+            for movie in Movie.objects.exclude(image="").only(
+                "image", "poster_variants"
+            )
+            if not is_content_addressed(movie.image.name)
+        ]
+        moved = 0
+        for movie in legacy:
+            old_name = movie.image.name
+            if not self.storage.exists(old_name):
+                self.stderr.write(f"{old_name}: file is missing")
+                continue
+            if self.dry_run:
+                moved += 1
+                continue
+            with self.storage.open(old_name) as file:
+                new_name = self.storage.save(old_name, file)
+            movie.image.name = new_name
+            if movie.poster_variants.get("source") == old_name:
+                movie.poster_variants["source"] = new_name
+            movie.save(update_fields=["image", "poster_variants"])
+            moved += 1
+        verb = "Would rehash" if self.dry_run else "Rehashed"
+        self.stdout.write(f"{verb} the posters of {moved} movies")
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+
+from movie.models import Movie
+from movie.posters import delete_variants, generate_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the resized WebP/JPEG posters of the movies uploaded before "
+        "the variants existed, or whose variants are out of date"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("movie_ids", nargs="*", type=int)
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument(
+            "--force", action="store_true", help="Regenerate up-to-date variants too"
+        )
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.exclude(image="").only("id", "image", "poster_variants")
+        if options["movie_ids"]:
+            movies = movies.filter(id__in=options["movie_ids"])
+        movies = {
+            movie.id: movie
+            for movie in movies
+            if options["force"]
+            or movie.poster_variants.get("source") != movie.image.name
+        }
+
+        done = failed = 0
+        # the workers only resize files, the database is written from here
+        with ProcessPoolExecutor(
+            max_workers=max(options["workers"], 1), initializer=django.setup
+        ) as executor:
+            futures = {
+                executor.submit(generate_variants, movie.image.name): movie
+                for movie in movies.values()
+            }
+            for future in as_completed(futures):
+                movie = futures[future]
+                try:
+                    variants = future.result()
+                except OSError as error:
+                    failed += 1
+                    self.stderr.write(f"{movie.image.name}: {error}")
+                    continue
+                old_variants = movie.poster_variants
+                movie.poster_variants = variants
+                movie.save(update_fields=["poster_variants"])
+                delete_variants(old_variants)
+                done += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated posters of {done} movies, {failed} failed")
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from movie.pagecache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the hit and miss counters of the anonymous page cache. The "
+        "counters live in the cache, so the servers need a shared backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Zero the counters afterwards"
+        )
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0
+        self.stdout.write(
+            f"hits: {stats['hits']}, misses: {stats['misses']}, "
+            f"hit ratio: {ratio:.1%}"
+        )
+        if options["reset"]:
+            reset_stats()
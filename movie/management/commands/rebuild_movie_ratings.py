@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from movie.models import Movie
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored rating aggregate of every movie from its reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument("movie_ids", nargs="*", type=int)
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.all()
+        if options["movie_ids"]:
+            movies = movies.filter(id__in=options["movie_ids"])
+
+        count = 0
+        for movie in movies.iterator():
+            movie.rebuild_rating()
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings of {count} movies"))
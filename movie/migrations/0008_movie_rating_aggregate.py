@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:25
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def rebuild_ratings(apps, schema_editor):
+    Movie = apps.get_model("movie", "Movie")
+    for movie in Movie.objects.all():
+        counts = movie.review_set.filter(existed=False).aggregate(
+            review_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{
+                f"rating_{star}_count": Count("id", filter=Q(rating=star))
+                for star in (1, 2, 3, 4, 5)
+            },
+        )
+        counts["rating_sum"] = counts["rating_sum"] or 0
+        if counts["review_count"]:
+            counts["average_rating"] = round(
+                counts["rating_sum"] / counts["review_count"], 2
+            )
+        Movie.objects.filter(id=movie.id).update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movie", "0007_alter_movie_content_alter_movie_image_and_more"),
+        ("review", "0004_alter_review_content"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="average_rating",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                max_digits=3,
+                null=True,
+                verbose_name="average rating",
+            ),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="review count"),
+        ),
+        migrations.RunPython(rebuild_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movie", "0008_movie_rating_aggregate"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["date_released", "id"], name="movie_released_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(fields=["-date_created"], name="movie_created_idx"),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:36
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+SEARCH_CONFIG = "simple"
+
+
+def create_search_indexes(apps, schema_editor):
+    # The GIN indexes only exist on PostgreSQL; SQLite deployments search
+    # without them
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX movie_search_vector_idx ON movie_movie "
+        "USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX movie_name_trgm_idx ON movie_movie "
+        "USING gin (name gin_trgm_ops)"
+    )
+
+    Movie = apps.get_model("movie", "Movie")
+    Tag = apps.get_model("movie", "Tag")
+    tag_name = Subquery(Tag.objects.filter(pk=OuterRef("tag_id")).values("name"))
+    Movie.objects.update(
+        search_vector=SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("content", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(tag_name, weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS movie_search_vector_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS movie_name_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movie", "0009_movie_indexes"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="movie",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
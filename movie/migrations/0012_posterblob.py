@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:53
+
+from django.db import migrations, models
+from django.db.models import Count
+import movie.storage
+
+
+def count_posters(apps, schema_editor):
+    Movie = apps.get_model("movie", "Movie")
+    PosterBlob = apps.get_model("movie", "PosterBlob")
+    counts = (
+        Movie.objects.exclude(image="")
+        .order_by()
+        .values("image")
+        .annotate(count=Count("id"))
+    )
+    PosterBlob.objects.bulk_create(
+        PosterBlob(name=row["image"], ref_count=row["count"]) for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movie", "0011_movie_poster_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PosterBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("date_updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="movie",
+            name="image",
+            field=models.ImageField(
+                storage=movie.storage.ContentAddressedStorage(),
+                upload_to="movies/",
+                verbose_name="圖片",
+            ),
+        ),
+        migrations.RunPython(count_posters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movie", "0012_posterblob"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="movie",
+            name="movie_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["-date_created", "-id"], name="movie_created_idx"
+            ),
+        ),
+    ]
@@ -1,9 +1,20 @@
 import datetime
+from decimal import Decimal, ROUND_HALF_UP
 
-from django.db import models
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connections, models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Greatest, Now
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 
+from .posters import Poster
+from .storage import ContentAddressedStorage
+
+# Text search configuration; "simple" does not stem, which suits Chinese text
+SEARCH_CONFIG = "simple"
+
 
 # Create your models here.
 class Tag(models.Model):
@@ -12,6 +23,10 @@ class Tag(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Movie.update_search_vector(Movie.objects.filter(tag_id=self))
+
     def __str__(self):
         return self.name
 
@@ -31,14 +46,197 @@ class Movie(models.Model):
     content = models.TextField(_("content"), max_length=500)
     official_site = models.URLField(_("official site"))
     time = models.PositiveSmallIntegerField(_("time"))
-    image = models.ImageField(_("image"), upload_to="movies/")
+    image = models.ImageField(
+        _("image"), upload_to="movies/", storage=ContentAddressedStorage()
+    )
     grade = models.TextField(_("grade"), choices=movie_grade)
     date_released = models.DateField(_("release date"), default=datetime.date.today)
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
 
+    # Rating aggregate over the reviews that have not been taken down
+    review_count = models.PositiveIntegerField(_("review count"), default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(
+        _("average rating"), max_digits=3, decimal_places=2, null=True, blank=True
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Resized copies of the image, see movie/posters.py
+    poster_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    RATING_STARS = (1, 2, 3, 4, 5)
+    RATING_FIELDS = [
+        "review_count",
+        "rating_sum",
+        "rating_1_count",
+        "rating_2_count",
+        "rating_3_count",
+        "rating_4_count",
+        "rating_5_count",
+        "average_rating",
+    ]
+
+    class Meta:
+        indexes = [
+            # The homepage walks this index and stops once a page of movies
+            # with an uploaded poster is found
+            models.Index(fields=["date_released", "id"], name="movie_released_idx"),
+            # The manage list breaks date_created ties by id
+            models.Index(fields=["-date_created", "-id"], name="movie_created_idx"),
+        ]
+
+    SEARCH_FIELDS = {"name", "content", "tag_id"}
+
     def get_absolute_url(self):
         return reverse("movie:detail", kwargs={"pk": self.pk})
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or self.SEARCH_FIELDS & set(update_fields):
+            self.update_search_vector(Movie.objects.filter(pk=self.pk))
+
+    @staticmethod
+    def update_search_vector(queryset):
+        """Recompute the full-text search vector, on PostgreSQL only."""
+        if connections[queryset.db].vendor != "postgresql":
+            return
+        tag_name = Subquery(Tag.objects.filter(pk=OuterRef("tag_id")).values("name"))
+        queryset.update(
+            search_vector=SearchVector("name", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("content", weight="B", config=SEARCH_CONFIG)
+            + SearchVector(tag_name, weight="C", config=SEARCH_CONFIG)
+        )
+
+    @cached_property
+    def poster(self):
+        return Poster(self)
+
+    @property
+    def rating_histogram(self):
+        return [
+            (star, getattr(self, f"rating_{star}_count"))
+            for star in reversed(self.RATING_STARS)
+        ]
+
+    def _refresh_average_rating(self):
+        if self.review_count:
+            self.average_rating = (
+                Decimal(self.rating_sum) / Decimal(self.review_count)
+            ).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        else:
+            self.average_rating = None
+
+    @classmethod
+    def lock_rating(cls, movie_id):
+        """Lock the movie row for a rating change until the transaction ends."""
+        return (
+            cls.objects.select_for_update()
+            # the cache receivers key fragments on date_updated
+            .only("id", "date_updated", *cls.RATING_FIELDS).get(id=movie_id)
+        )
+
+    def apply_rating(self, added=None, removed=None):
+        """Apply one review's rating change to the stored aggregate.
+
+        `added` is the rating that starts counting and `removed` the one that
+        stops counting, so an edit passes both. Call it on a movie returned by
+        `lock_rating()`.
+        """
+        for rating, step in ((added, 1), (removed, -1)):
+            if rating is None:
+                continue
+            field = f"rating_{rating}_count"
+            self.review_count += step
+            self.rating_sum += step * rating
+            setattr(self, field, getattr(self, field) + step)
+        self._refresh_average_rating()
+        self.save(update_fields=self.RATING_FIELDS)
+
+    @classmethod
+    def update_rating(cls, movie_id, added=None, removed=None):
+        """Lock the movie and apply a rating change, see `apply_rating()`."""
+        # inside a caller's transaction a savepoint would only add queries
+        with transaction.atomic(savepoint=False):
+            movie = cls.lock_rating(movie_id)
+            movie.apply_rating(added, removed)
+        return movie
+
+    def rebuild_rating(self):
+        """Recompute the stored aggregate from the review table."""
+        counts = self.review_set.filter(existed=False).aggregate(
+            review_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{
+                f"rating_{star}_count": Count("id", filter=Q(rating=star))
+                for star in self.RATING_STARS
+            },
+        )
+        counts["rating_sum"] = counts["rating_sum"] or 0
+        for field, value in counts.items():
+            setattr(self, field, value)
+        self._refresh_average_rating()
+        self.save(update_fields=self.RATING_FIELDS)
+
+    def __str__(self):
+        return self.name
+
+
+class PosterBlob(models.Model):
+    """A stored poster file and the number of movies using it.
+
+    Files are shared between movies with identical posters, see
+    ContentAddressedStorage. A blob that drops to zero references is left for
+    the collect_posters command, so a rolled back edit never loses its file.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def acquire(cls, name):
+        blob, created = cls.objects.get_or_create(name=name, defaults={"ref_count": 1})
+        if not created:
+            cls.objects.filter(pk=blob.pk).update(
+                ref_count=F("ref_count") + 1, date_updated=Now()
+            )
+
+    @classmethod
+    def release(cls, name):
+        cls.objects.filter(name=name).update(
+            ref_count=Greatest(F("ref_count") - 1, 0), date_updated=Now()
+        )
+
+    @classmethod
+    def reconcile(cls):
+        """Reset `ref_count` to the number of movies using each file.
+
+        Returns the number of blobs that were created or repaired.
+        """
+        counts = dict(
+            Movie.objects.exclude(image="")
+            .order_by()
+            .values("image")
+            .annotate(count=Count("id"))
+            .values_list("image", "count")
+        )
+        fixed = 0
+        for blob in cls.objects.all():
+            actual = counts.pop(blob.name, 0)
+            if blob.ref_count != actual:
+                blob.ref_count = actual
+                blob.save(update_fields=["ref_count", "date_updated"])
+                fixed += 1
+        cls.objects.bulk_create(
+            cls(name=name, ref_count=count) for name, count in counts.items()
+        )
+        return fixed + len(counts)
+
     def __str__(self):
         return self.name
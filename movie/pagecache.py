@@ -0,0 +1,210 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.http import urlencode
+
+from review.models import Heart, Review
+
+from .models import Movie, Tag
+
+# Cache alias of the anonymous full-page cache
+PAGE_CACHE = "pages"
+STATS_KEYS = {"hits": "page-cache-hits", "misses": "page-cache-misses"}
+
+
+def get_version(scope):
+    """Return the current version of the pages in `scope`.
+
+    A missing version, e.g. after an eviction, starts a new one, so the pages
+    cached under an older version are never served again.
+    """
+    page_cache = caches[PAGE_CACHE]
+    version = page_cache.get(f"page-version:{scope}")
+    if version is None:
+        version = bump_version(scope)
+    return version
+
+
+def bump_version(scope):
+    version = time.time_ns()
+    caches[PAGE_CACHE].set(f"page-version:{scope}", version, None)
+    return version
+
+
+def invalidate_pages(*scopes):
+    for scope in scopes:
+        bump_version(scope)
+    # a request may have cached the old rows again before the commit
+    transaction.on_commit(lambda: [bump_version(scope) for scope in scopes])
+
+
+def count(name):
+    page_cache = caches[PAGE_CACHE]
+    try:
+        page_cache.incr(STATS_KEYS[name])
+    except ValueError:
+        page_cache.add(STATS_KEYS[name], 0, None)
+        page_cache.incr(STATS_KEYS[name])
+
+
+def get_stats():
+    values = caches[PAGE_CACHE].get_many(STATS_KEYS.values())
+    return {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+def reset_stats():
+    caches[PAGE_CACHE].delete_many(STATS_KEYS.values())
+
+
+class AnonymousPageCacheMixin:
+    """Serve whole pages from the page cache to logged-out visitors.
+
+    Entries vary on the path, `page_cache_params` of the query string and the
+    language, and carry the version of `get_page_cache_scope()`, which the
+    model signals below bump whenever the data behind the page changes. A
+    scope of None turns the cache off. Every response gets an X-Page-Cache
+    header of hit, miss or bypass.
+
+    Reviewer names are part of the detail page but do not invalidate it, the
+    page cache TIMEOUT bounds how long a renamed user shows up.
+    """
+
+    page_cache_params = []
+
+    def get_page_cache_scope(self):
+        raise NotImplementedError
+
+    def get_page_cache_key(self, scope):
+        params = sorted(
+            (name, value)
+            for name, values in self.request.GET.lists()
+            if name in self.page_cache_params
+            for value in values
+        )
+        query = hashlib.md5(urlencode(params).encode()).hexdigest()
+        return ":".join(
+            [
+                "page",
+                self.request.path,
+                str(get_version(scope)),
+                translation.get_language(),
+                query,
+            ]
+        )
+
+    def get_page_cache_lookup(self, request):
+        """Return the cache key of this request, or None to bypass the cache."""
+        scope = self.get_page_cache_scope()
+        if (
+            scope is None
+            or request.method not in ("GET", "HEAD")
+            or request.user.is_authenticated
+        ):
+            return None
+        return self.get_page_cache_key(scope)
+
+    def get_cached_page(self, key):
+        cached = caches[PAGE_CACHE].get(key)
+        if cached is None:
+            count("misses")
+            return None
+        count("hits")
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+        response["X-Page-Cache"] = "hit"
+        return response
+
+    def cache_page(self, request, key, response):
+        response["X-Page-Cache"] = "miss"
+
+        def store(response):
+            # pages with a CSRF token belong to one visitor
+            if response.status_code == 200 and not request.META.get(
+                "CSRF_COOKIE_NEEDS_UPDATE"
+            ):
+                caches[PAGE_CACHE].set(
+                    key, (response.content, response["Content-Type"])
+                )
+
+        if hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.page_cache_adispatch(request, *args, **kwargs)
+        key = self.get_page_cache_lookup(request)
+        if key is None:
+            response = super().dispatch(request, *args, **kwargs)
+            response["X-Page-Cache"] = "bypass"
+            return response
+
+        response = self.get_cached_page(key)
+        if response is None:
+            response = self.cache_page(
+                request, key, super().dispatch(request, *args, **kwargs)
+            )
+        return response
+
+    async def page_cache_adispatch(self, request, *args, **kwargs):
+        # the user, the version and the cache lookup may all hit a backend
+        key = await sync_to_async(self.get_page_cache_lookup)(request)
+        if key is None:
+            response = await super().dispatch(request, *args, **kwargs)
+            response["X-Page-Cache"] = "bypass"
+            return response
+
+        response = await sync_to_async(self.get_cached_page)(key)
+        if response is None:
+            response = self.cache_page(
+                request, key, await super().dispatch(request, *args, **kwargs)
+            )
+        return response
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_movie_pages(sender, instance, **kwargs):
+    invalidate_pages("list", f"movie-{instance.id}")
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_tag_pages(sender, instance, **kwargs):
+    scopes = [
+        f"movie-{movie_id}"
+        for movie_id in Movie.objects.filter(tag_id=instance.id).values_list(
+            "id", flat=True
+        )
+    ]
+    invalidate_pages("list", *scopes)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_pages(sender, instance, **kwargs):
+    invalidate_pages(f"movie-{instance.movie_id}")
+
+
+@receiver(post_save, sender=Heart)
+@receiver(post_delete, sender=Heart)
+def invalidate_heart_pages(sender, instance, **kwargs):
+    if Heart.review.is_cached(instance):
+        # set_heart() hands over the review it locked
+        movie_id = instance.review.movie_id
+    else:
+        movie_id = (
+            Review.objects.filter(id=instance.review_id)
+            .values_list("movie_id", flat=True)
+            .first()
+        )
+    if movie_id is not None:
+        invalidate_pages(f"movie-{movie_id}")
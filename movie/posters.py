@@ -0,0 +1,112 @@
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Widths of the resized posters, the original is never scaled up
+POSTER_WIDTHS = (320, 640, 960)
+POSTER_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 75, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 80, "optimize": True, "progressive": True},
+}
+VARIANTS_DIR = "movies/variants"
+
+
+def open_image(name, storage=default_storage):
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    # phone photos are stored sideways with an EXIF rotation
+    return ImageOps.exif_transpose(image)
+
+
+def flatten(image):
+    """Return `image` as RGB, with transparency on a white background."""
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_variants(name, storage=default_storage):
+    """Write the resized WebP/JPEG variants of the poster stored at `name`.
+
+    Returns the data kept in Movie.poster_variants: the source name and size
+    and, per format, the name and size of each width.
+    """
+    image = flatten(open_image(name, storage))
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    widths = sorted({min(width, image.width) for width in POSTER_WIDTHS})
+
+    variants = {fmt: [] for fmt in POSTER_FORMATS}
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for fmt, options in POSTER_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, **options)
+            variant_name = storage.save(
+                f"{VARIANTS_DIR}/{stem}-{width}w.{fmt}", ContentFile(buffer.getvalue())
+            )
+            variants[fmt].append(
+                {"name": variant_name, "width": width, "height": height}
+            )
+
+    return {
+        "source": name,
+        "width": image.width,
+        "height": image.height,
+        "variants": variants,
+    }
+
+
+def delete_variants(data, storage=default_storage):
+    for variants in data.get("variants", {}).values():
+        for variant in variants:
+            storage.delete(variant["name"])
+
+
+class Poster:
+    """Template helper for the <picture> of a movie poster."""
+
+    def __init__(self, movie):
+        self.movie = movie
+        data = movie.poster_variants or {}
+        # variants of a replaced image are stale until regenerated
+        self.data = data if data.get("source") == movie.image.name else {}
+        self.variants = self.data.get("variants", {})
+
+    def __bool__(self):
+        return bool(self.variants)
+
+    def srcset(self, fmt):
+        return ", ".join(
+            f"{default_storage.url(variant['name'])} {variant['width']}w"
+            for variant in self.variants.get(fmt, [])
+        )
+
+    @property
+    def webp_srcset(self):
+        return self.srcset("webp")
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset("jpeg")
+
+    @property
+    def src(self):
+        if self.variants:
+            return default_storage.url(self.variants["jpeg"][-1]["name"])
+        return self.movie.image.url
+
+    @property
+    def width(self):
+        return self.data.get("width")
+
+    @property
+    def height(self):
+        return self.data.get("height")
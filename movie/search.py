@@ -0,0 +1,358 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+from django.db.models.functions import Cast
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import SEARCH_CONFIG, Movie, Tag
+
+# pg_trgm's default pg_trgm.similarity_threshold
+TRIGRAM_THRESHOLD = 0.3
+
+# ts_rank's default weights for the A, B and C labels of the search vector
+FIELD_WEIGHTS = {"name": 1.0, "content": 0.4, "tag": 0.2}
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """Split `text` into words the way the "simple" text search config does."""
+    return WORD_RE.findall(text.lower())
+
+
+def trigrams(text):
+    """Return the set of trigrams pg_trgm extracts from `text`."""
+    grams = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left, right):
+    """pg_trgm similarity of two trigram sets."""
+    if not left or not right:
+        return 0.0
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared)
+
+
+class IdIn(Func):
+    """`id IN (...)` with the ids written into the SQL.
+
+    As bound parameters the matches of a broad query would run past SQLite's
+    limit of 999 per query. The numbers come from the index, never from the
+    request, and are formatted as int.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, ids):
+        super().__init__(F("id"))
+        self.ids = ids
+
+    def as_sql(self, compiler, connection, **extra_context):
+        column, params = compiler.compile(self.source_expressions[0])
+        ids = ", ".join(str(int(movie_id)) for movie_id in self.ids)
+        return f"{column} IN ({ids})", params
+
+
+class IdRank(Func):
+    """The rank of each id of `ranks`, written into the SQL like IdIn."""
+
+    output_field = FloatField()
+
+    def __init__(self, ranks):
+        super().__init__(F("id"))
+        self.ranks = ranks
+
+    def as_sql(self, compiler, connection, **extra_context):
+        column, params = compiler.compile(self.source_expressions[0])
+        whens = " ".join(
+            f"WHEN {int(movie_id)} THEN {float(rank)!r}"
+            for movie_id, rank in self.ranks.items()
+        )
+        # a decimal literal is numeric on PostgreSQL, the cursors need floats
+        data_type = connection.data_types["FloatField"]
+        return f"CAST(CASE {column} {whens} ELSE 0.0 END AS {data_type})", params
+
+
+class SearchBackend:
+    """Base class of the movie search backends.
+
+    `search` filters a movie queryset to the matches of `query` and annotates
+    each of them with `search_rank`, higher is more relevant. The update hooks
+    are called after a movie is saved or deleted.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def update(self, queryset):
+        pass
+
+    def remove(self, movie_ids):
+        pass
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """Search in the database.
+
+    On PostgreSQL this combines the full-text rank over name, content and tag
+    with trigram similarity of the name, which still matches CJK titles that
+    the text parser cannot split into words. Other databases fall back to a
+    substring match on the name.
+    """
+
+    def search(self, queryset, query):
+        if connections[queryset.db].vendor != "postgresql":
+            return queryset.filter(name__contains=query).annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        # The sum is a float4; as double precision the rank written into a
+        # page cursor compares equal to the row it came from
+        return queryset.annotate(
+            search_rank=Cast(
+                SearchRank(F("search_vector"), search_query)
+                + TrigramSimilarity("name", query),
+                FloatField(),
+            )
+        ).filter(
+            Q(search_vector=search_query)
+            | Q(name__trigram_similar=query)
+            | Q(name__contains=query)
+        )
+
+
+class MemorySearchBackend(SearchBackend):
+    """Search an inverted index of the movies kept in process memory.
+
+    Matches the same movies as the PostgreSQL backend: every word of the query
+    is a word of the name, content or tag, or the name is trigram-similar to
+    the query, or the name contains the query. Character unigrams and bigrams
+    of the names narrow down the substring candidates, so Chinese titles do
+    not need a word splitter. Websearch operators (quotes, "or", "-") are not
+    supported; every word of the query must match.
+
+    The index is built on the first search and then updated from the Movie and
+    Tag signals once their transaction commits. Each process has its own index;
+    a generation counter in the cache tells the other processes to rebuild
+    theirs, so use a shared cache when running several workers.
+    """
+
+    generation_key = "movie-search-generation"
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.built = False
+            self.generation = None
+            self.documents = {}
+            self.grams = defaultdict(set)
+            self.trigrams = defaultdict(set)
+            self.words = defaultdict(set)
+
+    def get_generation(self):
+        return cache.get_or_set(self.generation_key, 0, None)
+
+    def bump_generation(self):
+        try:
+            return cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, 1, None)
+            return 1
+
+    def build(self):
+        with self.lock:
+            self.clear()
+            self.generation = self.get_generation()
+            for movie in self.get_movies(Movie.objects.all()):
+                self.add(movie)
+            self.built = True
+
+    def ensure_built(self):
+        with self.lock:
+            if not self.built or self.generation != self.get_generation():
+                self.build()
+
+    def get_movies(self, queryset):
+        return queryset.select_related("tag_id").only(
+            "id", "name", "content", "tag_id__name"
+        )
+
+    def name_grams(self, name):
+        return set(name) | {name[i : i + 2] for i in range(len(name) - 1)}
+
+    def add(self, movie):
+        words = {}
+        for field, text in [
+            ("tag", movie.tag_id.name),
+            ("content", movie.content),
+            ("name", movie.name),
+        ]:
+            for word in tokenize(text):
+                words[word] = FIELD_WEIGHTS[field]
+        name_trigrams = trigrams(movie.name)
+
+        self.documents[movie.id] = (movie.name, name_trigrams, words)
+        for gram in self.name_grams(movie.name):
+            self.grams[gram].add(movie.id)
+        for gram in name_trigrams:
+            self.trigrams[gram].add(movie.id)
+        for word in words:
+            self.words[word].add(movie.id)
+
+    def discard(self, movie_id):
+        document = self.documents.pop(movie_id, None)
+        if document is None:
+            return
+        name, name_trigrams, words = document
+        for postings, keys in [
+            (self.grams, self.name_grams(name)),
+            (self.trigrams, name_trigrams),
+            (self.words, words),
+        ]:
+            for key in keys:
+                postings[key].discard(movie_id)
+                if not postings[key]:
+                    del postings[key]
+
+    def apply(self, change):
+        with self.lock:
+            generation = self.bump_generation()
+            if not self.built:
+                return
+            change()
+            # Another process changed the movies in between, rebuild on next use
+            if generation == self.generation + 1:
+                self.generation = generation
+
+    def update(self, queryset):
+        def change():
+            for movie in self.get_movies(queryset):
+                self.discard(movie.id)
+                self.add(movie)
+
+        self.apply(change)
+
+    def remove(self, movie_ids):
+        def change():
+            for movie_id in movie_ids:
+                self.discard(movie_id)
+
+        self.apply(change)
+
+    def intersect(self, postings, keys):
+        result = None
+        for key in keys:
+            ids = postings.get(key, set())
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return set()
+        return result or set()
+
+    def match(self, query):
+        """Return {movie id: search rank} of the movies matching `query`."""
+        with self.lock:
+            matched = set()
+
+            query_words = tokenize(query)
+            if query_words:
+                matched |= self.intersect(self.words, query_words)
+
+            query_trigrams = trigrams(query)
+            similarities = {}
+            for gram in query_trigrams:
+                for movie_id in self.trigrams.get(gram, ()):
+                    if movie_id not in similarities:
+                        name_trigrams = self.documents[movie_id][1]
+                        similarities[movie_id] = similarity(
+                            query_trigrams, name_trigrams
+                        )
+            matched |= {
+                movie_id
+                for movie_id, value in similarities.items()
+                if value >= TRIGRAM_THRESHOLD
+            }
+
+            if len(query) > 1:
+                keys = {query[i : i + 2] for i in range(len(query) - 1)}
+            else:
+                keys = set(query)
+            candidates = self.intersect(self.grams, keys) if keys else self.documents
+            matched |= {
+                movie_id
+                for movie_id in candidates
+                if query in self.documents[movie_id][0]
+            }
+
+            ranks = {}
+            for movie_id in matched:
+                words = self.documents[movie_id][2]
+                rank = 0.0
+                if query_words and all(word in words for word in query_words):
+                    rank = sum(words[word] for word in query_words) / len(query_words)
+                ranks[movie_id] = rank + similarities.get(movie_id, 0.0)
+            return ranks
+
+    def search(self, queryset, query):
+        self.ensure_built()
+        ranks = self.match(query)
+        if not ranks:
+            return queryset.none().annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+        return queryset.filter(IdIn(ranks)).annotate(search_rank=IdRank(ranks))
+
+
+backends = {}
+
+
+def get_backend():
+    """Return the search backend chosen by the MOVIE_SEARCH_BACKEND setting."""
+    path = settings.MOVIE_SEARCH_BACKEND
+    if path not in backends:
+        backends[path] = import_string(path)()
+    return backends[path]
+
+
+def search_movies(queryset, query):
+    """Filter `queryset` to the movies matching `query`.
+
+    Every result is annotated with `search_rank`, higher is more relevant.
+    """
+    return get_backend().search(queryset, query)
+
+
+@receiver(post_save, sender=Movie)
+def update_movie_index(sender, instance, update_fields=None, **kwargs):
+    # rating updates do not touch the indexed fields
+    if update_fields is not None and not Movie.SEARCH_FIELDS & set(update_fields):
+        return
+    movies = Movie.objects.filter(id=instance.id)
+    transaction.on_commit(lambda: get_backend().update(movies))
+
+
+@receiver(post_delete, sender=Movie)
+def remove_movie_index(sender, instance, **kwargs):
+    movie_id = instance.id
+    transaction.on_commit(lambda: get_backend().remove([movie_id]))
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_index(sender, instance, **kwargs):
+    movies = Movie.objects.filter(tag_id=instance.id)
+    transaction.on_commit(lambda: get_backend().update(movies))
@@ -0,0 +1,46 @@
+import hashlib
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_NAME_RE = re.compile(r"^[0-9a-f]{64}(\.\w+)?$")
+
+
+def content_hash(content):
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+def is_content_addressed(name):
+    return bool(HASH_NAME_RE.match(posixpath.basename(name)))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that names files after the SHA-256 of their content.
+
+    Saving content that is already stored returns the existing name instead
+    of writing a copy, so identical uploads share one blob and a name always
+    refers to the same bytes. PosterBlob counts the movies using each file.
+    """
+
+    def hashed_name(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = posixpath.splitext(basename)[1].lower()
+        return posixpath.join(directory, content_hash(content) + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.hashed_name(self.generate_filename(name), content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
@@ -1,13 +1,46 @@
+import gzip
+import posixpath
+import tempfile
 import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-from django.test import Client, RequestFactory, TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import CommandError, call_command
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import Http404
+from django.db.utils import load_backend
+from django.test.utils import CaptureQueriesContext
+from unittest import skipUnless
 
+import brotli
 from faker import Faker
-from movie.models import Movie, Tag
+from PIL import Image
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from movie.fragments import FRAGMENT_CACHE
+from movie.models import Movie, PosterBlob, Tag
+from movie.pagecache import PAGE_CACHE, get_stats, get_version
+from movie.storage import is_content_addressed
+from movie.search import DatabaseSearchBackend, get_backend, search_movies
 from movie.factories import MovieFactory, TagFactory
 from movie.views import *
+from reports.models import Report
+from review.models import Review, Heart
+from review import services as review_services
 from users.factories import UserFactory
 
 
@@ -38,6 +71,335 @@ class MovieModelTest(TestCase):
             self.movie.date_updated.strftime("%Y-%m-%d %H:%M:%S"),
         )
 
+    def test_update_rating_maintains_aggregate(self):
+        Movie.update_rating(self.movie.id, added=5)
+        Movie.update_rating(self.movie.id, added=4)
+        movie = Movie.update_rating(self.movie.id, added=2, removed=4)
+
+        self.assertEqual(2, movie.review_count)
+        self.assertEqual(7, movie.rating_sum)
+        self.assertEqual(
+            [(5, 1), (4, 0), (3, 0), (2, 1), (1, 0)], movie.rating_histogram
+        )
+        self.assertEqual(Decimal("3.50"), movie.average_rating)
+
+    def test_rebuild_movie_ratings_command_repairs_aggregate(self):
+        user = UserFactory().create()
+        Review.objects.create(user=user, movie=self.movie, rating=5)
+        Review.objects.create(user=user, movie=self.movie, rating=4)
+        Review.objects.create(user=user, movie=self.movie, rating=1, existed=True)
+
+        call_command("rebuild_movie_ratings", stdout=StringIO())
+        self.movie.refresh_from_db()
+
+        self.assertEqual(2, self.movie.review_count)
+        self.assertEqual(9, self.movie.rating_sum)
+        self.assertEqual(0, self.movie.rating_1_count)
+        self.assertEqual(Decimal("4.50"), self.movie.average_rating)
+
+
+class BenchmarkIndexesCommandTest(TestCase):
+    def test_benchmark_reports_timings_and_rolls_back(self):
+        out = StringIO()
+
+        call_command(
+            "benchmark_indexes", movies=3, users=2, reviews=2, repeat=1, stdout=out
+        )
+
+        self.assertIn("summary (ms)", out.getvalue())
+        self.assertIn("homepage", out.getvalue())
+        self.assertEqual(0, Movie.objects.count())
+
+
+class BenchmarkConnectionsCommandTest(TestCase):
+    def test_benchmark_compares_connection_modes(self):
+        out = StringIO()
+
+        call_command("benchmark_connections", requests=3, stdout=out)
+
+        self.assertIn("connection per request", out.getvalue())
+        self.assertIn("persistent", out.getvalue())
+        self.assertIn("summary", out.getvalue())
+
+
+@skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+class ConnectionPoolTest(TestCase):
+    def setUp(self):
+        settings_dict = {
+            **connection.settings_dict,
+            "ENGINE": "moreview.dbpool",
+            "CONN_MAX_AGE": 0,
+            "POOL_SIZE": 1,
+        }
+        self.wrapper = load_backend("moreview.dbpool").DatabaseWrapper(
+            settings_dict, alias=connection.alias
+        )
+        self.addCleanup(self.wrapper.get_idle_pool().clear)
+        self.addCleanup(self.wrapper.close)
+
+    def backend_pid(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    def test_closed_connection_is_reused(self):
+        pid = self.backend_pid()
+        self.wrapper.close()
+
+        self.assertEqual(pid, self.backend_pid())
+
+    def test_open_transaction_is_rolled_back_when_given_back(self):
+        self.wrapper.set_autocommit(False)
+        self.backend_pid()
+        self.wrapper.close()
+
+        self.wrapper.connect()
+        self.assertEqual(
+            TRANSACTION_STATUS_IDLE, self.wrapper.connection.get_transaction_status()
+        )
+
+    def test_broken_connection_is_replaced(self):
+        pid = self.backend_pid()
+        self.wrapper.close()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+
+        self.assertNotEqual(pid, self.backend_pid())
+
+
+class CheckProductionCommandTest(TestCase):
+    def test_missing_settings_fail_the_check(self):
+        err = StringIO()
+
+        with self.settings(DEBUG=True), mock.patch.dict(
+            connection.settings_dict, {"CONN_HEALTH_CHECKS": False}
+        ):
+            with self.assertRaises(CommandError):
+                call_command("check_production", stdout=StringIO(), stderr=err)
+
+        self.assertIn("DEBUG is on", err.getvalue())
+        self.assertIn("manifest storage", err.getvalue())
+        self.assertIn("no connection health checks", err.getvalue())
+
+    def test_production_settings_pass(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        storages = {
+            **settings.STORAGES,
+            "staticfiles": {
+                "BACKEND": "moreview.storage.CompressedManifestStaticFilesStorage"
+            },
+        }
+        templates = [
+            {
+                **settings.TEMPLATES[0],
+                "APP_DIRS": False,
+                "OPTIONS": {
+                    **settings.TEMPLATES[0]["OPTIONS"],
+                    "loaders": [
+                        (
+                            "django.template.loaders.cached.Loader",
+                            [
+                                "django.template.loaders.filesystem.Loader",
+                                "django.template.loaders.app_directories.Loader",
+                            ],
+                        )
+                    ],
+                },
+            }
+        ]
+        out = StringIO()
+
+        with self.settings(
+            STATIC_ROOT=static_root.name, STORAGES=storages, TEMPLATES=templates
+        ), mock.patch.dict(
+            connection.settings_dict, {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True}
+        ):
+            staticfiles_storage.save_manifest()
+            call_command("check_production", stdout=out)
+
+        self.assertIn("look right", out.getvalue())
+
+
+class MovieSearchTest(TestCase):
+    def setUp(self):
+        self.tag = Tag.objects.create(name="科幻")
+        self.movie = self.create_movie("星際效應", "太空 探險 黑洞")
+        self.other = self.create_movie("寄生上流", "家庭 喜劇")
+
+    def create_movie(self, name, content):
+        return Movie.objects.create(
+            tag_id=self.tag,
+            name=name,
+            content=content,
+            official_site="test url",
+            time=120,
+            image="movies/test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+
+    def test_search_matches_part_of_the_name(self):
+        result = search_movies(Movie.objects.all(), "星際")
+
+        self.assertEqual([self.movie], list(result))
+
+    def test_homepage_search_uses_search_backend(self):
+        response = self.client.get(reverse("movie:list"), {"q": "寄生"})
+
+        self.assertEqual([self.other], list(response.context["object_list"]))
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_search_matches_content_and_tag(self):
+        self.assertEqual([self.movie], list(search_movies(Movie.objects.all(), "黑洞")))
+        self.assertEqual(
+            {self.movie, self.other},
+            set(search_movies(Movie.objects.all(), "科幻")),
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_search_vector_follows_tag_rename(self):
+        self.tag.name = "動作"
+        self.tag.save()
+
+        self.assertEqual(2, search_movies(Movie.objects.all(), "動作").count())
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_name_matches_rank_above_content_matches(self):
+        content_match = self.create_movie("Tenet", "a space heist")
+        name_match = self.create_movie("Space Jam", "basketball")
+
+        result = search_movies(Movie.objects.all(), "space").order_by("-search_rank")
+
+        self.assertEqual([name_match, content_match], list(result))
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    @override_settings(MOVIE_LIST_PAGE_SIZE=2)
+    def test_equal_ranks_page_without_duplicates_or_gaps(self):
+        matches = {self.create_movie("Space", "space") for _ in range(5)}
+        # logged in, so pages come from the view rather than the page cache
+        self.client.force_login(UserFactory().create())
+
+        seen = []
+        cursor = ""
+        for _ in range(len(matches)):
+            response = self.client.get(
+                reverse("movie:list"), {"q": "space", "cursor": cursor}
+            )
+            page = response.context["page_obj"]
+            seen += page.object_list
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(len(matches), len(seen))
+        self.assertEqual(matches, set(seen))
+
+
+@override_settings(MOVIE_SEARCH_BACKEND="movie.search.MemorySearchBackend")
+class MemorySearchTest(MovieSearchTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.backend = get_backend()
+        self.backend.clear()
+
+    def search(self, query):
+        return set(search_movies(Movie.objects.all(), query))
+
+    def test_index_is_built_on_first_search(self):
+        self.assertFalse(self.backend.built)
+
+        self.assertEqual({self.movie}, self.search("際效"))
+        self.assertTrue(self.backend.built)
+
+    def test_search_matches_content_tag_and_similar_name(self):
+        self.create_movie("Interstellar", "space")
+
+        self.assertEqual({self.movie}, self.search("黑洞 太空"))
+        self.assertEqual(set(), self.search("黑洞 喜劇"))
+        self.assertEqual(3, len(self.search("科幻")))
+        self.assertEqual(["Interstellar"], [m.name for m in self.search("Interstelar")])
+
+    def test_name_matches_rank_above_content_matches(self):
+        content_match = self.create_movie("Tenet", "a space heist")
+        name_match = self.create_movie("Space Jam", "basketball")
+
+        result = search_movies(Movie.objects.all(), "space").order_by("-search_rank")
+
+        self.assertEqual([name_match, content_match], list(result))
+
+    def test_broad_queries_keep_every_match(self):
+        Movie.objects.bulk_create(
+            Movie(
+                tag_id=self.tag,
+                name=f"Space {number}",
+                content="test content",
+                official_site="test url",
+                time=120,
+                image="movies/test.jpg",
+                grade="普遍級",
+                date_released="2022-12-12",
+            )
+            for number in range(600)
+        )
+
+        result = search_movies(Movie.objects.all(), "space")
+        _, params = result.query.sql_with_params()
+
+        # more matches than SQLite's 999 parameters could bind twice over
+        self.assertEqual(600, len(result))
+        self.assertEqual(0, len(params))
+
+    def test_index_follows_saves_and_deletes(self):
+        self.search("星際")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = self.create_movie("天能", "時間 逆轉")
+            self.movie.name = "星際穿越"
+            self.movie.save()
+            self.other.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = "動作"
+            self.tag.save()
+
+        # updated in place, without rebuilding the index
+        with self.assertNumQueries(1):
+            self.assertEqual({added}, self.search("逆轉"))
+        self.assertEqual({self.movie}, self.search("穿越"))
+        self.assertEqual(set(), self.search("寄生"))
+        self.assertEqual({self.movie, added}, self.search("動作"))
+
+    def test_rating_updates_keep_the_index(self):
+        self.search("星際")
+
+        with mock.patch.object(self.backend, "update") as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                Movie.update_rating(self.movie.id, added=5)
+
+        update.assert_not_called()
+
+    def test_changes_from_other_processes_rebuild_the_index(self):
+        self.search("星際")
+        added = self.create_movie("天能", "時間 逆轉")
+
+        cache.incr(self.backend.generation_key)
+
+        self.assertEqual({added}, self.search("天能"))
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_same_results_as_database_search(self):
+        self.create_movie("Interstellar", "space travel")
+        self.create_movie("Space Jam", "basketball")
+        database = DatabaseSearchBackend()
+
+        for query in ["星際", "際效", "黑洞", "科幻", "space", "Interstelar", "無"]:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    set(database.search(Movie.objects.all(), query)),
+                    self.search(query),
+                )
+
 
 class MovieCreateViewTest(TestCase):
     def setUp(self) -> None:
@@ -69,6 +431,372 @@ class MovieCreateViewTest(TestCase):
         )
 
 
+def poster_file(name="poster.png", size=(1200, 1800), mode="RGBA"):
+    buffer = BytesIO()
+    Image.new(mode, size, "red").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class PosterTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        caches[FRAGMENT_CACHE].clear()
+        caches[PAGE_CACHE].clear()
+
+        self.admin = UserFactory().is_superuser().create()
+        self.tag = Tag.objects.create(name="test")
+
+    def create_movie(self, image):
+        self.client.force_login(self.admin)
+        self.client.post(
+            reverse("movie:create"),
+            {
+                "tag_id": self.tag.id,
+                "name": "test",
+                "content": "test content",
+                "official_site": "https://example.com",
+                "time": 120,
+                "grade": "普遍級",
+                "date_released": "2022-12-12",
+                "image": image,
+            },
+        )
+        return Movie.objects.latest("id")
+
+    def movie_with_image(self, image):
+        data = {**MovieFactory().data, "name": "test", "image": image}
+        return Movie.objects.create(tag_id=self.tag, **data)
+
+
+class MoviePosterTest(PosterTestCase):
+    def test_upload_generates_resized_variants(self):
+        movie = self.create_movie(poster_file())
+
+        variants = movie.poster_variants["variants"]
+        self.assertEqual(movie.image.name, movie.poster_variants["source"])
+        self.assertEqual({"webp", "jpeg"}, set(variants))
+        self.assertEqual(
+            [(320, 480), (640, 960), (960, 1440)],
+            [(v["width"], v["height"]) for v in variants["webp"]],
+        )
+        for variant in variants["webp"] + variants["jpeg"]:
+            with default_storage.open(variant["name"]) as file:
+                image = Image.open(file)
+                self.assertEqual(variant["width"], image.width)
+
+    def test_small_posters_are_not_scaled_up(self):
+        movie = self.create_movie(poster_file(size=(400, 600), mode="P"))
+
+        widths = [v["width"] for v in movie.poster_variants["variants"]["jpeg"]]
+        self.assertEqual([320, 400], widths)
+
+    def test_replacing_the_image_deletes_old_variants(self):
+        movie = self.create_movie(poster_file())
+        old_names = [v["name"] for v in movie.poster_variants["variants"]["jpeg"]]
+
+        self.client.post(
+            reverse("movie:edit", kwargs={"pk": movie.pk}),
+            {
+                "tag_id": self.tag.id,
+                "name": "test",
+                "content": "test content",
+                "official_site": "https://example.com",
+                "time": 120,
+                "grade": "普遍級",
+                "date_released": "2022-12-12",
+                "image": poster_file("new.png"),
+            },
+        )
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.image.name, movie.poster_variants["source"])
+        self.assertFalse(any(default_storage.exists(name) for name in old_names))
+
+    def test_pages_render_srcset_with_dimensions(self):
+        movie = self.create_movie(poster_file())
+        self.client.logout()
+
+        for url in [reverse("movie:list"), reverse("movie:detail", args=[movie.pk])]:
+            response = self.client.get(url)
+            self.assertContains(response, 'type="image/webp"')
+            self.assertContains(response, "-640w.webp 640w")
+            self.assertContains(response, 'width="1200" height="1800"')
+
+    def test_posters_without_variants_fall_back_to_the_original(self):
+        movie = self.movie_with_image("movies/old.png")
+
+        self.assertFalse(movie.poster)
+        self.assertEqual("/media/movies/old.png", movie.poster.src)
+
+    def test_backfill_command_generates_missing_variants(self):
+        default_storage.save("movies/old.png", poster_file())
+        movie = self.movie_with_image("movies/old.png")
+        missing = self.movie_with_image("movies/missing.png")
+        out, err = StringIO(), StringIO()
+
+        call_command(
+            "generate_poster_variants", "--workers", "2", stdout=out, stderr=err
+        )
+        call_command("generate_poster_variants", stdout=out, stderr=err)
+
+        movie.refresh_from_db()
+        self.assertTrue(movie.poster)
+        self.assertIn("Generated posters of 1 movies, 1 failed", out.getvalue())
+        self.assertIn("Generated posters of 0 movies, 1 failed", out.getvalue())
+        self.assertIn(missing.image.name, err.getvalue())
+
+
+class MoviePosterStorageTest(PosterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.poster = poster_file().read()
+
+    def upload(self, content=None, name="poster.png"):
+        return SimpleUploadedFile(name, content or self.poster, "image/png")
+
+    def stored_posters(self):
+        return default_storage.listdir("movies")[1]
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command("collect_posters", "--min-age", "0", *args, stdout=out)
+        return out.getvalue()
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_movie(self.upload(name="01.png"))
+        second = self.create_movie(self.upload(name="01_copy.png"))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_content_addressed(first.image.name))
+        self.assertEqual([posixpath.basename(first.image.name)], self.stored_posters())
+        self.assertEqual(2, PosterBlob.objects.get(name=first.image.name).ref_count)
+
+    def test_replaced_and_deleted_posters_are_collected(self):
+        movie = self.create_movie(self.upload())
+        other = self.create_movie(self.upload(poster_file(size=(500, 700)).read()))
+        old_name = movie.image.name
+
+        self.client.post(
+            reverse("movie:edit", kwargs={"pk": movie.pk}),
+            {
+                "tag_id": self.tag.id,
+                "name": "test",
+                "content": "test content",
+                "official_site": "https://example.com",
+                "time": 120,
+                "grade": "普遍級",
+                "date_released": "2022-12-12",
+                "image": self.upload(poster_file(size=(600, 900)).read()),
+            },
+        )
+        self.client.post(reverse("movie:delete", kwargs={"pk": other.pk}))
+
+        self.assertEqual(0, PosterBlob.objects.get(name=old_name).ref_count)
+        self.assertEqual(0, PosterBlob.objects.get(name=other.image.name).ref_count)
+        # both old posters and the variants of the deleted movie
+        self.assertIn("Would remove 6 files", self.collect("--dry-run"))
+        self.assertIn("Removed 6 files", self.collect())
+
+        movie.refresh_from_db()
+        self.assertEqual([posixpath.basename(movie.image.name)], self.stored_posters())
+        self.assertEqual(
+            [movie.image.name], list(PosterBlob.objects.values_list("name", flat=True))
+        )
+        self.assertTrue(
+            default_storage.exists(movie.poster_variants["variants"]["jpeg"][0]["name"])
+        )
+
+    def test_recently_released_posters_are_kept(self):
+        movie = self.create_movie(self.upload())
+        self.client.post(reverse("movie:delete", kwargs={"pk": movie.pk}))
+
+        call_command("collect_posters", stdout=StringIO())
+
+        self.assertEqual(1, len(self.stored_posters()))
+
+    def test_rehash_moves_legacy_duplicates_to_one_blob(self):
+        for name in ["movies/01.png", "movies/01_Tlsyjir.png"]:
+            default_storage.save(name, ContentFile(self.poster))
+        first = self.movie_with_image("movies/01.png")
+        second = self.movie_with_image("movies/01_Tlsyjir.png")
+
+        self.collect("--rehash")
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual([posixpath.basename(first.image.name)], self.stored_posters())
+        self.assertEqual(2, PosterBlob.objects.get(name=first.image.name).ref_count)
+
+
+class MediaServingTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.hashed = f"movies/{'a' * 64}.png"
+        self.legacy = "movies/01.png"
+        for name in [self.hashed, self.legacy]:
+            default_storage.save(name, ContentFile(b"0123456789"))
+
+    def get(self, name, **headers):
+        return self.client.get(f"/media/{name}", headers=headers)
+
+    def test_files_are_streamed_with_cache_headers(self):
+        response = self.get(self.hashed)
+
+        self.assertEqual(b"0123456789", b"".join(response.streaming_content))
+        self.assertEqual("image/png", response["Content-Type"])
+        self.assertEqual("10", response["Content-Length"])
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertNotIn("immutable", self.get(self.legacy)["Cache-Control"])
+
+    def test_conditional_requests_get_not_modified(self):
+        etag = self.get(self.hashed)["ETag"]
+
+        self.assertEqual(304, self.get(self.hashed, if_none_match=etag).status_code)
+        self.assertEqual(200, self.get(self.hashed, if_none_match='"x"').status_code)
+
+    def test_range_requests(self):
+        response = self.get(self.hashed, range="bytes=2-4")
+        self.assertEqual(206, response.status_code)
+        self.assertEqual(b"234", b"".join(response.streaming_content))
+        self.assertEqual("bytes 2-4/10", response["Content-Range"])
+
+        response = self.get(self.hashed, range="bytes=-3")
+        self.assertEqual(b"789", b"".join(response.streaming_content))
+
+        self.assertEqual(416, self.get(self.hashed, range="bytes=20-").status_code)
+        self.assertEqual(
+            200, self.get(self.hashed, range="bytes=2-4", if_range='"old"').status_code
+        )
+
+    def test_proxy_sends_the_file(self):
+        with self.settings(MEDIA_SENDFILE="x-accel"):
+            response = self.get(self.hashed)
+            self.assertEqual(
+                f"/protected-media/{self.hashed}", response["X-Accel-Redirect"]
+            )
+            self.assertEqual(b"", response.content)
+            self.assertIn("immutable", response["Cache-Control"])
+
+        with self.settings(MEDIA_SENDFILE="x-sendfile"):
+            response = self.get(self.legacy)
+            self.assertEqual(default_storage.path(self.legacy), response["X-Sendfile"])
+
+    def test_missing_files_and_paths_outside_media_root(self):
+        self.assertEqual(404, self.get("movies/missing.png").status_code)
+        self.assertEqual(404, self.get("../settings.py").status_code)
+        self.assertEqual(404, self.get("movies").status_code)
+
+
+class StaticCompressionTest(TestCase):
+    def test_collectstatic_writes_hashed_and_compressed_assets(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        storages = {
+            **settings.STORAGES,
+            "staticfiles": {
+                "BACKEND": "moreview.storage.CompressedManifestStaticFilesStorage"
+            },
+        }
+
+        with self.settings(STATIC_ROOT=static_root.name, STORAGES=storages):
+            call_command("collectstatic", "--noinput", verbosity=0)
+
+            name = staticfiles_storage.stored_name("css/custom.css")
+            with staticfiles_storage.open(name) as file:
+                content = file.read()
+            with staticfiles_storage.open(name + ".gz") as file:
+                self.assertEqual(content, gzip.decompress(file.read()))
+            with staticfiles_storage.open(name + ".br") as file:
+                self.assertEqual(content, brotli.decompress(file.read()))
+            self.assertFalse(
+                staticfiles_storage.exists(
+                    staticfiles_storage.stored_name("images/favicon.ico") + ".gz"
+                )
+            )
+
+
+class AsyncMovieViewTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = UserFactory().create()
+        self.tag = Tag.objects.create(name="test")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="movies/test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        author = UserFactory().create()
+        self.reviews = [
+            Review.objects.create(user=author, movie=self.movie, heart_count=count)
+            for count in range(3)
+        ]
+        self.own = Review.objects.create(user=self.user, movie=self.movie)
+        Heart.objects.create(user=self.user, review=self.reviews[1])
+        Report.objects.create(user=self.user, review=self.reviews[2], content="spam")
+
+    def get(self, view_class, path, user=None, **kwargs):
+        request = self.factory.get(path, {"order": "heart_highest"})
+        request.user = user or AnonymousUser()
+        request.session = SessionStore()
+        view = view_class.as_view()
+        if view_class.view_is_async:
+            view = async_to_sync(view)
+        response = view(request, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    def test_detail_context_matches_the_sync_view(self):
+        path = reverse("movie:detail", kwargs={"pk": self.movie.pk})
+
+        expected = self.get(MovieDetailView, path, self.user, pk=self.movie.pk)
+        response = self.get(AsyncMovieDetailView, path, self.user, pk=self.movie.pk)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self.movie, response.context_data["movie"])
+        self.assertEqual(
+            list(expected.context_data["review_list"]),
+            list(response.context_data["review_list"]),
+        )
+        self.assertEqual({self.reviews[1].id}, response.context_data["heart_list"])
+        self.assertEqual({self.own.id}, response.context_data["self_review_list"])
+        self.assertEqual(
+            {self.reviews[2].id}, response.context_data["self_report_list"]
+        )
+
+    def test_detail_of_a_missing_movie_is_not_found(self):
+        path = reverse("movie:detail", kwargs={"pk": 0})
+
+        with self.assertRaises(Http404):
+            self.get(AsyncMovieDetailView, path, pk=0)
+
+    def test_list_answers_from_the_page_cache_and_with_not_modified(self):
+        path = reverse("movie:list")
+        caches[PAGE_CACHE].clear()
+
+        first = self.get(AsyncMovieListView, path)
+        second = self.get(AsyncMovieListView, path)
+        request = self.factory.get(path, HTTP_IF_NONE_MATCH=first["ETag"])
+        request.user = AnonymousUser()
+        not_modified = async_to_sync(AsyncMovieListView.as_view())(request)
+
+        self.assertEqual([self.movie], list(first.context_data["object_list"]))
+        self.assertEqual("miss", first["X-Page-Cache"])
+        self.assertEqual("hit", second["X-Page-Cache"])
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(304, not_modified.status_code)
+
+
 class MovieListViewTest(TestCase):
     view = MovieListView()
     client = Client()
@@ -87,6 +815,81 @@ class MovieListViewTest(TestCase):
         response = self.client.get(reverse("movie:manage-list"))
         self.assertIs(200, response.status_code)
 
+    def create_movies(self, count):
+        tag = Tag.objects.create(name="test")
+        for day in range(1, count + 1):
+            Movie.objects.create(
+                tag_id=tag,
+                name=f"movie {day}",
+                content="test content",
+                official_site="test url",
+                time=120,
+                image="movies/test.jpg",
+                grade="普遍級",
+                date_released=f"2022-12-{day // 2 + 1:02}",
+            )
+
+    @override_settings(MOVIE_LIST_PAGE_SIZE=2)
+    def test_homepage_is_cursor_paginated_in_both_orders(self):
+        self.create_movies(5)
+        for order, ordering in [
+            ("Desc", ["-date_released", "-id"]),
+            ("Asc", ["date_released", "id"]),
+        ]:
+            seen = []
+            params = {"order": order}
+            while True:
+                response = self.client.get(reverse("movie:list"), params)
+                page = response.context["page_obj"]
+                self.assertLessEqual(len(page), 2)
+                seen += page.object_list
+                if not page.has_next:
+                    break
+                params["cursor"] = page.next_cursor
+
+            self.assertEqual(list(Movie.objects.order_by(*ordering)), seen)
+
+    @override_settings(MOVIE_LIST_PAGE_SIZE=2)
+    def test_homepage_pagination_keeps_search_query(self):
+        self.create_movies(5)
+        response = self.client.get(reverse("movie:list"), {"q": "movie"})
+
+        self.assertEqual("q=movie", response.context["pagination_query"])
+        self.assertContains(response, "?q=movie&cursor=")
+
+    @override_settings(MOVIE_LIST_PAGE_SIZE=2)
+    def test_manage_list_is_paginated_by_date_created(self):
+        self.create_movies(5)
+        response = self.client.get(reverse("movie:manage-list"), {"page": 3})
+
+        self.assertEqual(
+            list(Movie.objects.order_by("-date_created", "-id")[4:]),
+            list(response.context["object_list"]),
+        )
+
+    @override_settings(MOVIE_LIST_PAGE_SIZE=2)
+    def test_manage_list_pages_movies_created_at_once(self):
+        self.create_movies(5)
+        Movie.objects.update(date_created=timezone.now())
+
+        seen = []
+        for page in range(1, 4):
+            response = self.client.get(reverse("movie:manage-list"), {"page": page})
+            seen += response.context["object_list"]
+
+        self.assertEqual(list(Movie.objects.order_by("-id")), seen)
+
+    @skipUnless(connection.vendor == "sqlite", "reads SQLite's query plan")
+    def test_manage_list_order_is_read_from_the_index(self):
+        self.create_movies(5)
+        request = RequestFactory().get(reverse("movie:manage-list"))
+        queryset = MovieListView(request=request).get_queryset()
+
+        plan = queryset[:2].explain()
+
+        self.assertIn("movie_created_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
 
 class MovieDetailViewTest(TestCase):
     def setUp(self):
@@ -113,6 +916,418 @@ class MovieDetailViewTest(TestCase):
         )
         self.assertEqual(200, response.status_code)
 
+    def test_reviews_can_be_ordered_by_heart_count(self):
+        user = UserFactory().create()
+        popular = Review.objects.create(user=user, movie=self.movie, heart_count=5)
+        unpopular = Review.objects.create(user=user, movie=self.movie, heart_count=1)
+        url = reverse("movie:detail", kwargs={"pk": self.movie.pk})
+
+        highest = self.client.get(url, {"order": "heart_highest"})
+        lowest = self.client.get(url, {"order": "heart_lowest"})
+
+        self.assertEqual([popular, unpopular], list(highest.context["review_list"]))
+        self.assertEqual([unpopular, popular], list(lowest.context["review_list"]))
+
+    @mock.patch.object(MovieDetailView, "reviews_per_page", 3)
+    def test_reviews_are_paginated_with_keyset_for_every_order(self):
+        user = UserFactory().create()
+        for rating in [1, 1, 1, 3, 3, 5, 5, 5]:
+            Review.objects.create(
+                user=user, movie=self.movie, rating=rating, heart_count=rating % 2
+            )
+        Review.objects.create(user=user, movie=self.movie, existed=True)
+        url = reverse("movie:detail", kwargs={"pk": self.movie.pk})
+        visible = Review.objects.filter(movie=self.movie, existed=False)
+
+        for order, ordering in MovieDetailView.review_orderings.items():
+            direction = "-" if ordering.startswith("-") else ""
+            expected = list(visible.order_by(ordering, direction + "id"))
+            seen = []
+            cursor = ""
+            while True:
+                response = self.client.get(url, {"order": order, "cursor": cursor})
+                page = response.context["review_page"]
+                self.assertLessEqual(len(page), 3)
+                seen += page.object_list
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+
+            self.assertEqual(expected, seen, order)
+
+    @mock.patch.object(MovieDetailView, "reviews_per_page", 1)
+    def test_review_fragment_returns_only_review_cards(self):
+        user = UserFactory().create()
+        Review.objects.create(user=user, movie=self.movie, content="first page")
+        Review.objects.create(user=user, movie=self.movie, content="second page")
+        first = self.client.get(
+            reverse("movie:detail", kwargs={"pk": self.movie.pk})
+        ).context["review_page"]
+
+        response = self.client.get(
+            reverse("movie:reviews", kwargs={"pk": self.movie.pk}),
+            {"cursor": first.next_cursor},
+        )
+
+        self.assertContains(response, "first page")
+        self.assertNotContains(response, "second page")
+        self.assertNotContains(response, "<html")
+
+    def test_invalid_review_cursor_starts_from_first_page(self):
+        user = UserFactory().create()
+        review = Review.objects.create(user=user, movie=self.movie)
+
+        response = self.client.get(
+            reverse("movie:detail", kwargs={"pk": self.movie.pk}),
+            {"cursor": "not-a-cursor"},
+        )
+
+        self.assertEqual([review], response.context["review_list"])
+
+    def test_user_review_context_contains_review_ids(self):
+        user = UserFactory().create()
+        other = UserFactory().create()
+        own_review = Review.objects.create(user=user, movie=self.movie, content="own")
+        other_review = Review.objects.create(
+            user=other, movie=self.movie, content="other"
+        )
+        Heart.objects.create(user=user, review=other_review)
+        Report.objects.create(user=user, review=other_review, content="report")
+
+        self.client.login(username=user.username, password="Passw0rd!")
+        response = self.client.get(
+            reverse("movie:detail", kwargs={"pk": self.movie.pk})
+        )
+
+        self.assertEqual({other_review.id}, response.context["heart_list"])
+        self.assertEqual({own_review.id}, response.context["self_review_list"])
+        self.assertEqual({other_review.id}, response.context["self_report_list"])
+
+    def test_detail_page_query_count_does_not_grow_with_data(self):
+        user = UserFactory().create()
+        self.client.login(username=user.username, password="Passw0rd!")
+        url = reverse("movie:detail", kwargs={"pk": self.movie.pk})
+
+        def create_reviews(count):
+            for _ in range(count):
+                author = UserFactory().create()
+                review = Review.objects.create(
+                    user=author, movie=self.movie, content="test"
+                )
+                Heart.objects.create(user=user, review=review)
+                Heart.objects.create(user=author, review=review)
+                Report.objects.create(user=user, review=review, content="report")
+
+        create_reviews(1)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+
+        create_reviews(10)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url)
+
+        self.assertEqual(len(small), len(large))
+
+
+class MovieFragmentCacheTest(TestCase):
+    def setUp(self):
+        caches[FRAGMENT_CACHE].clear()
+        self.tag = Tag.objects.create(name="科幻")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="movies/test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        self.detail_url = reverse("movie:detail", kwargs={"pk": self.movie.pk})
+
+    def cached(self, fragment, language="zh-hant"):
+        key = make_template_fragment_key(
+            fragment, [self.movie.id, self.movie.date_updated, language]
+        )
+        return caches[FRAGMENT_CACHE].get(key)
+
+    def test_pages_cache_the_movie_fragments(self):
+        self.client.get(reverse("movie:list"))
+        self.client.get(self.detail_url)
+
+        self.assertIn("test", self.cached("movie_card"))
+        self.assertIn("test content", self.cached("movie_header"))
+
+    def test_cached_header_skips_the_tag_query(self):
+        self.client.get(self.detail_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.detail_url)
+
+        self.assertContains(response, "科幻")
+        # the conditional GET validator only joins the tag for its timestamp
+        self.assertFalse(
+            any('FROM "movie_tag"' in q["sql"] for q in queries.captured_queries)
+        )
+
+    def test_each_language_gets_its_own_entry(self):
+        self.client.get(self.detail_url, HTTP_ACCEPT_LANGUAGE="en")
+        self.assertIsNone(self.cached("movie_header"))
+
+        self.client.get(self.detail_url, HTTP_ACCEPT_LANGUAGE="zh-hant")
+        self.assertIn("test content", self.cached("movie_header", "en"))
+        self.assertIn("test content", self.cached("movie_header"))
+
+    def test_rating_update_invalidates_the_fragments(self):
+        self.client.get(reverse("movie:list"))
+        self.client.get(self.detail_url)
+
+        Movie.update_rating(self.movie.id, added=4)
+
+        self.assertIsNone(self.cached("movie_card"))
+        self.assertIsNone(self.cached("movie_header"))
+        self.assertContains(self.client.get(self.detail_url), "4.00")
+
+    def test_review_report_and_tag_changes_invalidate_the_fragments(self):
+        user = UserFactory().create()
+        review = Review.objects.create(user=user, movie=self.movie, rating=3)
+        for change in [
+            lambda: Report.objects.create(user=user, review=review, content="spam"),
+            lambda: review.delete(),
+            lambda: Tag.objects.filter(id=self.tag.id).get().save(),
+        ]:
+            # render the page rather than serve it from the page cache
+            caches[PAGE_CACHE].clear()
+            self.client.get(self.detail_url)
+            self.assertIsNotNone(self.cached("movie_header"))
+
+            change()
+
+            self.assertIsNone(self.cached("movie_header"))
+
+
+class MoviePageCacheTest(TestCase):
+    def setUp(self):
+        caches[PAGE_CACHE].clear()
+        self.tag = Tag.objects.create(name="科幻")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="movies/test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        self.detail_url = reverse("movie:detail", kwargs={"pk": self.movie.pk})
+
+    def cache_status(self, url, data=None, **extra):
+        return self.client.get(url, data, **extra)["X-Page-Cache"]
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        for url in [reverse("movie:list"), self.detail_url]:
+            self.assertEqual("miss", self.cache_status(url))
+            self.assertEqual("hit", self.cache_status(url))
+
+        self.assertEqual({"hits": 2, "misses": 2}, get_stats())
+
+    def test_cache_varies_on_query_params_and_language(self):
+        self.cache_status(reverse("movie:list"), {"order": "Asc"})
+
+        self.assertEqual("miss", self.cache_status(reverse("movie:list")))
+        self.assertEqual(
+            "hit", self.cache_status(reverse("movie:list"), {"order": "Asc", "x": 1})
+        )
+        self.assertEqual("miss", self.cache_status(reverse("movie:list"), {"q": "t"}))
+        self.assertEqual(
+            "miss",
+            self.cache_status(
+                reverse("movie:list"), {"order": "Asc"}, HTTP_ACCEPT_LANGUAGE="en"
+            ),
+        )
+
+    def test_authenticated_users_and_manage_list_bypass_cache(self):
+        self.assertEqual("bypass", self.cache_status(reverse("movie:manage-list")))
+
+        self.client.force_login(UserFactory().create())
+
+        self.assertEqual("bypass", self.cache_status(self.detail_url))
+        self.assertEqual("bypass", self.cache_status(self.detail_url))
+
+    def test_review_and_heart_changes_invalidate_the_detail_page(self):
+        user = UserFactory().create()
+        self.cache_status(reverse("movie:list"))
+        self.cache_status(self.detail_url)
+
+        review = Review.objects.create(user=user, movie=self.movie, content="nice")
+        self.assertContains(self.client.get(self.detail_url), "nice")
+        self.assertEqual("hit", self.cache_status(self.detail_url))
+        self.assertEqual("hit", self.cache_status(reverse("movie:list")))
+
+        Heart.objects.create(user=user, review=review)
+        self.assertEqual("miss", self.cache_status(self.detail_url))
+
+    def test_detail_page_with_reviews_is_served_from_cache(self):
+        user = UserFactory().create()
+        Review.objects.create(user=user, movie=self.movie, content="nice")
+
+        first = self.client.get(self.detail_url)
+        second = self.client.get(self.detail_url)
+
+        # a CSRF token would keep the page out of the cache
+        self.assertNotContains(first, "csrfmiddlewaretoken")
+        self.assertEqual("miss", first["X-Page-Cache"])
+        self.assertEqual("hit", second["X-Page-Cache"])
+        self.assertEqual(first.content, second.content)
+
+    def test_heart_services_invalidate_the_detail_page(self):
+        user = UserFactory().create()
+        review = Review.objects.create(user=user, movie=self.movie, content="nice")
+        scope = f"movie-{self.movie.id}"
+        for hearted in [True, False]:
+            version = get_version(scope)
+
+            review_services.set_heart(user.id, review.id, hearted)
+
+            self.assertNotEqual(version, get_version(scope))
+
+    def test_movie_changes_invalidate_list_and_detail_pages(self):
+        self.cache_status(reverse("movie:list"))
+        self.cache_status(self.detail_url)
+
+        Movie.update_rating(self.movie.id, added=5)
+
+        self.assertEqual("miss", self.cache_status(reverse("movie:list")))
+        self.assertContains(self.client.get(self.detail_url), "5.00")
+
+    def test_stats_command(self):
+        self.cache_status(self.detail_url)
+        self.cache_status(self.detail_url)
+        out = StringIO()
+
+        call_command("page_cache_stats", "--reset", stdout=out)
+
+        self.assertIn("hits: 1, misses: 1, hit ratio: 50.0%", out.getvalue())
+        self.assertEqual({"hits": 0, "misses": 0}, get_stats())
+
+
+class MovieConditionalGetTest(TestCase):
+    def setUp(self):
+        caches[PAGE_CACHE].clear()
+        self.user = UserFactory().create()
+        self.tag = Tag.objects.create(name="科幻")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="movies/test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        self.detail_url = reverse("movie:detail", kwargs={"pk": self.movie.pk})
+
+    def etag(self, url, **extra):
+        return self.client.get(url, **extra)["ETag"]
+
+    def test_unchanged_pages_answer_not_modified(self):
+        for url in [reverse("movie:list"), self.detail_url]:
+            response = self.client.get(url)
+            self.assertEqual(200, response.status_code)
+            self.assertTrue(response["ETag"].startswith('W/"'))
+            self.assertIn("no-cache", response["Cache-Control"])
+
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(304, again.status_code)
+            self.assertEqual(response["ETag"], again["ETag"])
+
+    def test_new_login_does_not_reuse_the_old_page(self):
+        self.client.login(username=self.user.username, password="Passw0rd!")
+        etag = self.etag(self.detail_url)
+        self.client.logout()
+        self.client.login(username=self.user.username, password="Passw0rd!")
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(200, response.status_code)
+
+    def test_login_is_not_answered_from_the_modification_time(self):
+        anonymous = self.client.get(self.detail_url)
+        self.client.login(username=self.user.username, password="Passw0rd!")
+
+        # the timestamps would not tell the anonymous page from the user's
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=http_date(time.time())
+        )
+
+        self.assertNotIn("Last-Modified", anonymous)
+        self.assertEqual(200, response.status_code)
+
+    def test_not_modified_only_runs_the_validator_query(self):
+        for url in [reverse("movie:list"), self.detail_url]:
+            etag = self.etag(url)
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(304, response.status_code)
+
+    def test_missing_movie_is_not_found(self):
+        url = reverse("movie:detail", kwargs={"pk": self.movie.pk + 1})
+
+        self.assertEqual(404, self.client.get(url).status_code)
+
+    def test_reviews_and_hearts_change_the_detail_etag(self):
+        etags = [self.etag(self.detail_url)]
+        review = Review.objects.create(user=self.user, movie=self.movie, content="a")
+        etags.append(self.etag(self.detail_url))
+        heart = Heart.objects.create(user=self.user, review=review)
+        etags.append(self.etag(self.detail_url))
+        heart.delete()
+        etags.append(self.etag(self.detail_url))
+        Review.objects.filter(pk=review.pk).update(existed=True)
+        etags.append(self.etag(self.detail_url))
+
+        for before, after in zip(etags, etags[1:]):
+            self.assertNotEqual(before, after)
+
+    def test_review_edit_changes_the_detail_etag(self):
+        review = Review.objects.create(user=self.user, movie=self.movie, content="a")
+        self.movie.rebuild_rating()
+        self.client.force_login(self.user)
+        etag = self.etag(self.detail_url)
+
+        self.client.post(
+            reverse("review:edit", kwargs={"pk": review.pk}),
+            {
+                "movieID": self.movie.id,
+                "reviewID": review.id,
+                "content": "b",
+                "rating": "4",
+            },
+        )
+
+        self.assertNotEqual(etag, self.etag(self.detail_url))
+
+    def test_etag_varies_on_user_and_language(self):
+        etag = self.etag(self.detail_url)
+
+        self.assertNotEqual(etag, self.etag(self.detail_url, HTTP_ACCEPT_LANGUAGE="en"))
+        self.client.force_login(self.user)
+        response = self.client.get(self.detail_url)
+        self.assertNotEqual(etag, response["ETag"])
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_list_etag_changes_with_movies_and_ratings(self):
+        etags = [self.etag(reverse("movie:list"))]
+        Movie.update_rating(self.movie.id, added=5)
+        etags.append(self.etag(reverse("movie:list")))
+        self.tag.name = "動作"
+        self.tag.save()
+        etags.append(self.etag(reverse("movie:list")))
+
+        self.assertEqual(len(etags), len(set(etags)))
+
 
 class MovieDeleteViewTest(TestCase):
     def setUp(self):
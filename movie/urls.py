@@ -1,13 +1,25 @@
+from django.conf import settings
 from django.urls import path
 
 
 from . import views
 
+# ASYNC_VIEWS serves the read views from coroutines
+if settings.ASYNC_VIEWS:
+    list_view = views.AsyncMovieListView.as_view()
+    detail_view = views.AsyncMovieDetailView.as_view()
+    review_list_view = views.AsyncMovieReviewListView.as_view()
+else:
+    list_view = views.MovieListView.as_view()
+    detail_view = views.MovieDetailView.as_view()
+    review_list_view = views.MovieReviewListView.as_view()
+
 app_name = "movie"
 urlpatterns = [
-    path("", views.MovieListView.as_view(), name="list"),
-    path("movies", views.MovieListView.as_view(), name="manage-list"),
-    path("movies/<int:pk>", views.MovieDetailView.as_view(), name="detail"),
+    path("", list_view, name="list"),
+    path("movies", list_view, name="manage-list"),
+    path("movies/<int:pk>", detail_view, name="detail"),
+    path("movies/<int:pk>/reviews", review_list_view, name="reviews"),
     path("movies/create", views.MovieCreateView.as_view(), name="create"),
     path("movies/<int:pk>/edit", views.MovieEditView.as_view(), name="edit"),
     path("movies/<int:pk>/delete", views.MovieDeleteView.as_view(), name="delete"),
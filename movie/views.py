@@ -1,8 +1,12 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.mixins import UserPassesTestMixin, LoginRequiredMixin
 from django.urls import reverse, reverse_lazy
+from django.utils.translation import gettext as _
 from review.models import Review, Heart
-from django.db.models import Count, Avg, Func, IntegerField, Case, When
 
 from django.views.generic import (
     CreateView,
@@ -13,20 +17,24 @@ from django.views.generic import (
 )
 
 from .forms import MovieModelForm
+from .search import search_movies
 from review.forms import ReviewModelForm
 from review.models import Review
-from movie.models import Movie
+from movie.models import Movie, PosterBlob
 from reports.models import Report
 from reports.forms import ReportModelForm
+from moreview.asyncviews import AsyncListMixin, aload_user, aset
+from moreview.conditional import ConditionalGetMixin
+from moreview.pagination import (
+    KeysetPaginationMixin,
+    KeysetPaginator,
+    PaginationQueryMixin,
+)
+from .pagecache import AnonymousPageCacheMixin
 
 # Create your views here.
 
 
-class Round(Func):
-    function = "Round"
-    template = "%(function)s(%(expressions)s, 2)"
-
-
 class MovieCreateView(UserPassesTestMixin, CreateView):
     model = Movie
     template_name = "movie_create_form.html"
@@ -37,157 +45,251 @@ class MovieCreateView(UserPassesTestMixin, CreateView):
         return self.request.user.is_superuser
 
 
-class MovieDetailView(DetailView):
+class MovieDetailView(ConditionalGetMixin, AnonymousPageCacheMixin, DetailView):
     model = Movie
     template_name = "movie_detail.html"
+    reviews_per_page = 10
+    review_orderings = {
+        "latest": "-date_created",
+        "oldest": "date_created",
+        "heart_highest": "-heart_count",
+        "heart_lowest": "heart_count",
+        "rating_highest": "-rating",
+        "rating_lowest": "rating",
+    }
+    page_cache_params = ["order", "cursor"]
+    user_review_lists = ["heart_list", "self_review_list", "self_report_list"]
+
+    def get_page_cache_scope(self):
+        return f"movie-{self.kwargs['pk']}"
+
+    def get_validator(self):
+        """Fetch the timestamps and counts the page depends on in one query."""
+        reviews = Review.objects.filter(movie_id=OuterRef("pk")).order_by()
+        reviews = reviews.values("movie_id")
+        hearts = Heart.objects.filter(review__movie_id=OuterRef("pk")).order_by()
+        hearts = hearts.values("review__movie_id")
+        validators = {
+            "review_updated": Max("date_updated"),
+            "visible_reviews": Count("id", filter=Q(existed=False)),
+        }
+        annotations = {
+            name: Subquery(reviews.annotate(value=value).values("value"))
+            for name, value in validators.items()
+        }
+        annotations["heart_created"] = Subquery(
+            hearts.annotate(value=Max("date_created")).values("value")
+        )
+        annotations["hearts"] = Subquery(
+            hearts.annotate(value=Count("id")).values("value")
+        )
+
+        user = self.request.user
+        if user.is_authenticated:
+            # the report buttons depend on the user's own reports
+            reports = Report.objects.filter(
+                user_id=user.id, review__movie_id=OuterRef("pk")
+            ).order_by()
+            reports = reports.values("user_id")
+            annotations["report_updated"] = Subquery(
+                reports.annotate(value=Max("date_updated")).values("value")
+            )
+            annotations["reports"] = Subquery(
+                reports.annotate(value=Count("id")).values("value")
+            )
+
+        row = (
+            Movie.objects.filter(pk=self.kwargs["pk"])
+            .annotate(**annotations)
+            .values("date_updated", "tag_id__date_updated", *annotations)
+            .first()
+        )
+        if row is None:
+            return None
+        return list(row.values())
 
     def get_context_data(self, **kwargs):
         context = super(MovieDetailView, self).get_context_data(**kwargs)
         context["form"] = ReviewModelForm()
         context["report_create_form"] = ReportModelForm()
 
-        # movie average rating
-        context["movie"] = Movie.objects.annotate(
-            average_rating=Round(
-                Avg(
-                    Case(
-                        When(review__existed=False, then="review__rating"),
-                        output_field=IntegerField(),
-                    )
-                )
-            )
-        ).get(id=self.kwargs["pk"])
-
         # sort, default : "latest"
         order = self.request.GET.get("order")
-        # According to date_created
-        order_query = "-date_created"
-        if order == "oldest":
-            order_query = "date_created"
-
-        review_list = (
-            Review.objects.filter(movie_id=self.object.id)
-            .annotate(heart_number=Count("heart"))
-            .order_by(order_query)
+        review_page = self.get_review_page(order)
+
+        context["review_page"] = review_page
+        context["review_list"] = review_page.object_list
+        context["order"] = order
+        context.update(self.get_user_review_context())
+
+        return context
+
+    def get_review_paginator(self, order):
+        return KeysetPaginator(
+            Review.objects.filter(
+                movie_id=self.kwargs["pk"], existed=False
+            ).select_related("user"),
+            self.review_orderings.get(order, self.review_orderings["latest"]),
+            self.reviews_per_page,
         )
 
-        # According to number of heart
-        # highest
-        if order == "heart_highest":
-            review_list = (
-                Review.objects.filter(movie_id=self.object.id)
-                .annotate(heart_number=Count("heart"))
-                .order_by("-heart_number")
-            )
-        # lowest
-        elif order == "heart_lowest":
-            review_list = (
-                Review.objects.filter(movie_id=self.object.id)
-                .annotate(heart_number=Count("heart"))
-                .order_by("heart_number")
-            )
+    def get_review_page(self, order):
+        """Return one keyset page of the visible reviews in the requested order."""
+        return self.get_review_paginator(order).get_page(self.request.GET.get("cursor"))
 
-        # According to rating
-        # highest
-        if order == "rating_highest":
-            review_list = (
-                Review.objects.filter(movie_id=self.object.id)
-                .annotate(heart_number=Count("heart"))
-                .order_by("-rating")
-            )
-        # lowest
-        elif order == "rating_lowest":
-            review_list = (
-                Review.objects.filter(movie_id=self.object.id)
-                .annotate(heart_number=Count("heart"))
-                .order_by("rating")
+    def get_user_review_querysets(self):
+        """Querysets of the review ids behind each list of the user review context."""
+        user = self.request.user
+        movie_id = self.kwargs["pk"]
+        if not user.is_authenticated:
+            return {}
+
+        # Displays the hearts that the user has clicked
+        querysets = {
+            "heart_list": Heart.objects.filter(
+                user_id=user.id, review__movie_id=movie_id
+            ).values_list("review_id", flat=True)
+        }
+        if not user.is_superuser:
+            querysets["self_review_list"] = Review.objects.filter(
+                movie_id=movie_id, user_id=user.id, existed=False
+            ).values_list("id", flat=True)
+            querysets["self_report_list"] = Report.objects.filter(
+                user_id=user.id, review__movie_id=movie_id
+            ).values_list("review_id", flat=True)
+        return querysets
+
+    def get_user_review_context(self):
+        """Collect the current user's hearts, reviews and reports on this movie.
+
+        Each list holds review ids so the template can test membership without
+        touching the database again. The number of queries does not depend on
+        how many hearts, reviews or reports exist.
+        """
+        context = {name: set() for name in self.user_review_lists}
+        for name, queryset in self.get_user_review_querysets().items():
+            context[name] = set(queryset)
+        return context
+
+
+class MovieReviewListView(MovieDetailView):
+    """Next page of review cards for the detail page's "load more" button."""
+
+    template_name = "review_list.html"
+
+
+class AsyncMovieDetailView(MovieDetailView):
+    """MovieDetailView for ASGI.
+
+    The movie, the review page and the user's hearts, reviews and reports are
+    awaited one after another: the async ORM runs them all on the request's
+    thread and connection anyway, see moreview/asyncviews.py.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        await aload_user(request)
+        self.object = await self.aget_object()
+        paginator = self.get_review_paginator(request.GET.get("order"))
+        self.review_page = await paginator.aget_page(request.GET.get("cursor"))
+        self.user_review_context = {name: set() for name in self.user_review_lists}
+        for name, queryset in self.get_user_review_querysets().items():
+            self.user_review_context[name] = await aset(queryset)
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    async def aget_object(self):
+        try:
+            return await self.get_queryset().aget(pk=self.kwargs["pk"])
+        except Movie.DoesNotExist:
+            raise Http404(
+                _("No %(verbose_name)s found matching the query")
+                % {"verbose_name": Movie._meta.verbose_name}
             )
 
-        context["review_list"] = review_list
-        context["order"] = order
+    def get_review_page(self, order):
+        return self.review_page
 
-        # Displays the hearts that the user has clicked
-        heart_list = Heart.objects.all()
-        context["heart_list"] = []
-        for heart in heart_list:
-            if heart.user.id == self.request.user.id:
-                for review in context["review_list"]:
-                    if heart.review.id == review.id:
-                        context["heart_list"].append(
-                            Heart.objects.get(
-                                user=self.request.user.id, review=review.id
-                            )
-                        )
-
-        context["self_review_list"] = []
-        for review in context["review_list"]:
-            if self.request.user.id == review.user.id and review.existed != True:
-                if not self.request.user.is_superuser:
-                    context["self_review_list"].append(review)
-
-        report_list = Report.objects.filter(user=self.request.user.id)
-
-        context["report_list"] = report_list
-        context["self_report_list"] = []
-        for report in report_list:
-            for review in context["review_list"]:
-                if report.review.id == review.id:
-                    if not self.request.user.is_superuser:
-                        context["self_report_list"].append(review)
+    def get_user_review_context(self):
+        return self.user_review_context
 
-        return context
+
+class AsyncMovieReviewListView(AsyncMovieDetailView):
+    template_name = "review_list.html"
 
 
-class MovieListView(ListView):
+class MovieListView(
+    ConditionalGetMixin,
+    AnonymousPageCacheMixin,
+    KeysetPaginationMixin,
+    PaginationQueryMixin,
+    ListView,
+):
     model = Movie
     home_template_name = "homepage.html"
     manage_template_name = "movie_list.html"
-    queryset = Movie.objects.filter(image__contains="movies/").order_by(
-        "-date_released"
-    )
+
+    page_cache_params = ["q", "order", "cursor"]
+
+    def is_homepage(self):
+        return self.request.path == reverse("movie:list")
+
+    def get_page_cache_scope(self):
+        # only the homepage, the manage list is paged with offsets
+        return "list" if self.is_homepage() else None
+
+    def get_validator(self):
+        # ratings change without touching date_updated, so add their totals
+        row = Movie.objects.aggregate(
+            updated=Max("date_updated"),
+            tag_updated=Max("tag_id__date_updated"),
+            movies=Count("id"),
+            reviews=Sum("review_count"),
+            ratings=Sum("rating_sum"),
+        )
+        return list(row.values())
 
     def get_template_names(self, *args, **kwargs):
-        if self.request.path == reverse("movie:list"):
+        if self.is_homepage():
             return [self.home_template_name]
         else:
             return [self.manage_template_name]
 
+    def get_paginate_by(self, queryset):
+        return settings.MOVIE_LIST_PAGE_SIZE
+
+    def get_queryset(self):
+        # get request
+        query = self.request.GET.get("q")
+        if self.is_homepage():
+            movie_obj = Movie.objects.filter(image__contains="movies/")
+        else:
+            # the id breaks date_created ties, so offset pages never overlap
+            movie_obj = Movie.objects.order_by("-date_created", "-id")
+
+        if query is not None:  # search
+            movie_obj = search_movies(movie_obj, query)
+        return movie_obj
+
+    def get_keyset_paginator(self, queryset, page_size):
+        if not self.is_homepage():
+            return None
+
+        # The homepage pages with a cursor on (date_released, id), or on the
+        # relevance rank when searching
+        order_query = "-date_released"
+        if self.request.GET.get("q") is not None:
+            order_query = "-search_rank"
+        elif self.request.GET.get("order") == "Asc":
+            order_query = "date_released"
+        return KeysetPaginator(queryset, order_query, page_size)
+
     def get_context_data(self, **kwargs):
         context = super(MovieListView, self).get_context_data(**kwargs)
+        context["order"] = self.request.GET.get("order")
+        return context
 
-        if self.request.path == reverse("movie:list"):
-            # get request
-            query = self.request.GET.get("q")
-            order = self.request.GET.get("order")
-            order_query = "-date_released"
-            movie_obj = None
-            if order == "Asc":
-                order_query = "date_released"
-
-            if query is not None:  # search
-                movie_obj = Movie.objects.filter(
-                    name__contains=query, image__contains="movies/"
-                ).order_by(order_query)
-            else:  # not search
-                movie_obj = Movie.objects.filter(image__contains="movies/").order_by(
-                    order_query
-                )
-            context["object_list"] = movie_obj
-            context["order"] = order
-
-            return context
-        else:
-            # get request
-            query = self.request.GET.get("q")
-            movie_obj = None
-            if query is not None:  # serch
-                movie_obj = Movie.objects.filter(name__contains=query).order_by(
-                    "-date_created"
-                )
-            else:  # not search
-                movie_obj = Movie.objects.all().order_by("-date_created")
-            context["object_list"] = movie_obj
-            return context
+
+class AsyncMovieListView(AsyncListMixin, MovieListView):
+    """MovieListView for ASGI, the homepage page is read with the async ORM."""
 
 
 class MovieEditView(UserPassesTestMixin, UpdateView):
@@ -208,5 +310,12 @@ class MovieDeleteView(UserPassesTestMixin, DeleteView):
     def test_func(self):
         return self.request.user.is_superuser
 
+    def form_valid(self, form):
+        with transaction.atomic():
+            response = super().form_valid(form)
+            # the file stays until collect_posters finds it unused
+            PosterBlob.release(self.object.image.name)
+        return response
+
     def get_success_url(self):
         return reverse("movie:manage-list")
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0002_alter_report_review"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(
+                fields=["user", "-date_updated"], name="report_user_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(
+                fields=["status", "-date_updated"], name="report_status_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0003_report_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="report",
+            name="report_user_updated_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="report",
+            name="report_status_updated_idx",
+        ),
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(
+                fields=["user", "-date_updated", "-id"], name="report_user_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(
+                fields=["status", "-date_updated", "-id"],
+                name="report_status_updated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(
+                condition=models.Q(("status", 3), _negated=True),
+                fields=["-date_updated", "-id"],
+                name="report_open_updated_idx",
+            ),
+        ),
+    ]
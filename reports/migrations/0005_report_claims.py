@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("reports", "0004_report_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="report",
+            name="claimed_by",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="claimed_reports",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="report",
+            name="claimed_until",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(
+                condition=models.Q(("status", 0)),
+                fields=["date_created", "id"],
+                name="report_pending_created_idx",
+            ),
+        ),
+    ]
@@ -27,6 +27,36 @@ class Report(models.Model):
     status = models.IntegerField(default=UNDERPROCESS, choices=REPORT_STATUS)
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
+    # The moderator working on the report, until the lease runs out
+    claimed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="claimed_reports"
+    )
+    claimed_until = models.DateTimeField(null=True)
+
+    class Meta:
+        # The report lists page with a cursor on (-date_updated, -id)
+        indexes = [
+            models.Index(
+                fields=["user", "-date_updated", "-id"],
+                name="report_user_updated_idx",
+            ),
+            models.Index(
+                fields=["status", "-date_updated", "-id"],
+                name="report_status_updated_idx",
+            ),
+            # the moderation queue without a status filter hides TAKEBACK
+            models.Index(
+                fields=["-date_updated", "-id"],
+                condition=~models.Q(status=3),
+                name="report_open_updated_idx",
+            ),
+            # claiming hands out the oldest pending report first
+            models.Index(
+                fields=["date_created", "id"],
+                condition=models.Q(status=0),
+                name="report_pending_created_idx",
+            ),
+        ]
 
     def get_absolute_url(self):
         return reverse("movie:detail", kwargs={"pk": self.pk})
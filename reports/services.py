@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from movie.models import Movie
+from review.models import Review
+
+from .models import Report
+
+# Times a claim is retried when another moderator takes the same report first
+CLAIM_ATTEMPTS = 5
+
+
+def create_report(user_id, review_id, content):
+    review = Review.objects.only("id", "movie_id").get(id=review_id)
+    return Report.objects.create(user_id=user_id, review=review, content=content)
+
+
+def take_back_report(report_id, user_id):
+    """Withdraw one of the user's own reports."""
+    return Report.objects.filter(id=report_id, user_id=user_id).update(
+        status=Report.TAKEBACK, date_updated=Now()
+    )
+
+
+def handle_report(report_id, handler_id, accept):
+    return handle_reports([report_id], handler_id, accept)
+
+
+def handle_reports(report_ids, handler_id, accept):
+    """Accept or refuse the open reports among `report_ids`.
+
+    Accepting takes the reported reviews down and closes every other open
+    report on them as accepted, so nobody handles those again. Returns the
+    number of reports closed.
+    """
+    open_reports = Report.objects.filter(status=Report.UNDERPROCESS)
+    handled = {"handler_id": handler_id, "date_updated": Now()}
+    with transaction.atomic():
+        if not accept:
+            return open_reports.filter(id__in=report_ids).update(
+                status=Report.FAILED, **handled
+            )
+
+        # Locking the reviews first makes concurrent accepts of the same
+        # review wait, then see it already taken down
+        reviews = list(
+            Review.objects.select_for_update()
+            .filter(id__in=open_reports.filter(id__in=report_ids).values("review_id"))
+            .only("id", "movie_id", "rating", "existed")
+        )
+        closed = open_reports.filter(review__in=[r.id for r in reviews]).update(
+            status=Report.SUCCESS, **handled
+        )
+        taken_down = [review for review in reviews if not review.existed]
+        if taken_down:
+            Review.objects.filter(id__in=[r.id for r in taken_down]).update(
+                existed=True
+            )
+        for review in taken_down:
+            Movie.update_rating(review.movie_id, removed=review.rating)
+    return closed
+
+
+def claimable_reports(handler_id, now):
+    """Pending reports the moderator may work on, oldest first."""
+    return (
+        Report.objects.filter(status=Report.UNDERPROCESS)
+        .filter(
+            Q(claimed_until__isnull=True)
+            | Q(claimed_until__lt=now)
+            | Q(claimed_by_id=handler_id)
+        )
+        .order_by("date_created", "id")
+    )
+
+
+def claim_next_report(handler_id):
+    """Lease the oldest pending report nobody else holds to the moderator.
+
+    A moderator who still holds a claim gets the same report back. Returns
+    the report id, or None when the queue is empty. Where the database
+    supports it, rows other moderators are claiming are skipped instead of
+    waited on; elsewhere the claim is a compare-and-set on the old lease,
+    retried when another moderator won the row.
+    """
+    now = timezone.now()
+    lease = {
+        "claimed_by_id": handler_id,
+        "claimed_until": now + timedelta(seconds=settings.REPORT_CLAIM_LEASE),
+    }
+    reports = claimable_reports(handler_id, now)
+    own = reports.filter(claimed_by_id=handler_id, claimed_until__gte=now)
+
+    if connections[reports.db].features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            report_id = (
+                own.values_list("id", flat=True).first()
+                or reports.select_for_update(skip_locked=True)
+                .values_list("id", flat=True)
+                .first()
+            )
+            if report_id is not None:
+                Report.objects.filter(id=report_id).update(**lease)
+            return report_id
+
+    for _ in range(CLAIM_ATTEMPTS):
+        candidate = (
+            own.values("id", "claimed_until").first()
+            or reports.values("id", "claimed_until").first()
+        )
+        if candidate is None:
+            return None
+        if Report.objects.filter(
+            id=candidate["id"],
+            status=Report.UNDERPROCESS,
+            claimed_until=candidate["claimed_until"],
+        ).update(**lease):
+            return candidate["id"]
+    return None
+
+
+def release_report(report_id, handler_id):
+    """Give a claimed report back to the queue before the lease runs out."""
+    return Report.objects.filter(id=report_id, claimed_by_id=handler_id).update(
+        claimed_by=None, claimed_until=None
+    )
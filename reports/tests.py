@@ -1,10 +1,25 @@
-from django.test import TestCase, Client
+import threading
+from datetime import timedelta
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync
+from django.db import connection, connections, transaction
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 import time
 
 from faker import Faker
 from movie.models import Movie, Tag
 from review.models import Review, Heart
+from reports import services
 from reports.models import Report
 from reports.views import *
 from users.factories import UserFactory
@@ -155,6 +170,122 @@ class ReportListViewTest(TestCase):
         self.assertEqual(200, response.status_code)
 
 
+class ReportQueueTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory().create()
+        self.admin = UserFactory().is_superuser().create()
+        self.tag = Tag.objects.create(name="test")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        self.review = Review.objects.create(
+            user=self.user, movie=self.movie, content="test"
+        )
+
+    def create_reports(self, statuses):
+        return [
+            Report.objects.create(
+                user=self.user, review=self.review, content=f"report {i}", status=status
+            )
+            for i, status in enumerate(statuses)
+        ]
+
+    def listed(self, response):
+        return [report.id for report in response.context["object_list"]]
+
+    @override_settings(REPORT_LIST_PAGE_SIZE=2)
+    def test_async_view_pages_like_the_sync_view(self):
+        self.create_reports([Report.UNDERPROCESS] * 3 + [Report.TAKEBACK])
+        view = async_to_sync(AsyncReportListView.as_view())
+
+        pages = []
+        cursor = ""
+        while True:
+            request = RequestFactory().get(reverse("reports:list"), {"cursor": cursor})
+            request.user = self.admin
+            response = view(request)
+            response.render()
+            page = response.context_data["page_obj"]
+            pages.append([report.id for report in page])
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        self.client.force_login(self.admin)
+        expected = self.listed(self.client.get(reverse("reports:list")))
+        self.assertEqual(expected, pages[0])
+        self.assertEqual([2, 1], [len(page) for page in pages])
+
+    def test_queue_hides_taken_back_reports(self):
+        open_report, taken_back = self.create_reports(
+            [Report.UNDERPROCESS, Report.TAKEBACK]
+        )
+        self.client.force_login(self.admin)
+
+        response = self.client.get(reverse("reports:list"))
+
+        self.assertEqual([open_report.id], self.listed(response))
+
+    def test_queue_filters_by_status(self):
+        pending, accepted, refused = self.create_reports(
+            [Report.UNDERPROCESS, Report.SUCCESS, Report.FAILED]
+        )
+        self.client.force_login(self.admin)
+
+        response = self.client.get(reverse("reports:list"), {"status": "1"})
+        self.assertEqual([accepted.id], self.listed(response))
+
+        response = self.client.get(reverse("reports:list"), {"status": "all"})
+        self.assertEqual([refused.id, accepted.id, pending.id], self.listed(response))
+
+    @override_settings(REPORT_LIST_PAGE_SIZE=2)
+    def test_queue_pages_with_a_cursor(self):
+        reports = self.create_reports([Report.UNDERPROCESS] * 3)
+        self.client.force_login(self.admin)
+
+        response = self.client.get(reverse("reports:list"))
+        page = response.context["page_obj"]
+        self.assertEqual([reports[2].id, reports[1].id], self.listed(response))
+
+        response = self.client.get(
+            reverse("reports:list"), {"cursor": page.next_cursor}
+        )
+        self.assertEqual([reports[0].id], self.listed(response))
+        self.assertFalse(response.context["page_obj"].has_next)
+
+    def test_queue_queries_do_not_grow_with_reports(self):
+        self.create_reports([Report.UNDERPROCESS])
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(reverse("reports:list"))
+
+        self.create_reports([Report.SUCCESS, Report.FAILED] * 3)
+        Report.objects.filter(status=Report.SUCCESS).update(handler=self.admin)
+        with self.assertNumQueries(len(one)):
+            response = self.client.get(reverse("reports:list"))
+        self.assertContains(response, self.admin.username)
+
+    def test_user_list_shows_only_own_reports(self):
+        own = self.create_reports([Report.TAKEBACK])[0]
+        Report.objects.create(user=self.admin, review=self.review, content="other")
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("reports:list"))
+
+        self.assertEqual([own.id], self.listed(response))
+        self.assertContains(response, self.movie.name)
+        # user and one joined page query, the session is read from the cache
+        self.assertEqual(2, len(queries))
+
+
 class ReportReviewViewTest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -202,3 +333,286 @@ class ReportReviewViewTest(TestCase):
 
         self.assertEqual(2, updated_report.status)
         self.assertEqual(self.admin.username, updated_report.handler.username)
+
+    def test_accept_report_removes_review_from_movie_rating(self):
+        self.movie.rebuild_rating()
+        self.client.login(username=self.admin.username, password="Passw0rd!")
+        self.client.post(
+            reverse("reports:edit", kwargs={"pk": self.report.id}),
+            {"accept_report": ""},
+        )
+        self.client.post(
+            reverse("reports:edit", kwargs={"pk": self.report.id}),
+            {"accept_report": ""},
+        )
+        self.movie.refresh_from_db()
+
+        self.assertTrue(Review.objects.get(id=self.review.id).existed)
+        self.assertEqual(0, self.movie.review_count)
+        self.assertIsNone(self.movie.average_rating)
+
+
+class BulkReportReviewTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory().create()
+        self.admin = UserFactory().is_superuser().create()
+        self.tag = Tag.objects.create(name="test")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        self.reviews = [
+            Review.objects.create(user=self.user, movie=self.movie, rating=rating)
+            for rating in (2, 5)
+        ]
+        self.movie.rebuild_rating()
+        # two reports on the first review, one on the second
+        self.reports = [
+            Report.objects.create(user=self.user, review=review, content="spam")
+            for review in [self.reviews[0], self.reviews[0], self.reviews[1]]
+        ]
+
+    def post(self, action, reports):
+        return self.client.post(
+            reverse("reports:bulk-edit"),
+            {action: "", "report_ids": [report.id for report in reports]},
+        )
+
+    def statuses(self):
+        return [Report.objects.get(id=report.id).status for report in self.reports]
+
+    def test_accept_closes_sibling_reports(self):
+        self.client.force_login(self.admin)
+
+        response = self.post("accept_report", [self.reports[0]])
+
+        self.assertRedirects(response, reverse("reports:list"))
+        self.assertEqual(
+            [Report.SUCCESS, Report.SUCCESS, Report.UNDERPROCESS], self.statuses()
+        )
+        self.assertEqual(
+            2, Report.objects.filter(handler=self.admin, status=Report.SUCCESS).count()
+        )
+        self.movie.refresh_from_db()
+        self.assertTrue(Review.objects.get(id=self.reviews[0].id).existed)
+        self.assertEqual(1, self.movie.review_count)
+        self.assertEqual(5, self.movie.rating_sum)
+
+    def test_accept_many_reviews_in_one_request(self):
+        self.client.force_login(self.admin)
+
+        self.post("accept_report", [self.reports[1], self.reports[2]])
+
+        self.assertEqual([Report.SUCCESS] * 3, self.statuses())
+        self.movie.refresh_from_db()
+        self.assertEqual(0, self.movie.review_count)
+
+    def test_refuse_leaves_sibling_reports_open(self):
+        self.client.force_login(self.admin)
+
+        self.post("refuse_report", [self.reports[0], self.reports[2]])
+
+        self.assertEqual(
+            [Report.FAILED, Report.UNDERPROCESS, Report.FAILED], self.statuses()
+        )
+        self.assertFalse(Review.objects.filter(existed=True).exists())
+
+    def test_handled_reports_are_not_changed_again(self):
+        self.client.force_login(self.admin)
+        self.post("refuse_report", [self.reports[2]])
+
+        self.post("accept_report", [self.reports[2]])
+
+        self.assertEqual(Report.FAILED, self.statuses()[2])
+        self.assertFalse(Review.objects.get(id=self.reviews[1].id).existed)
+
+    def test_accept_query_count(self):
+        # lock the reviews, close their reports, hide them, then one rating
+        # update per review taken down
+        with self.assertNumQueries(9):
+            closed = services.handle_reports(
+                [report.id for report in self.reports], self.admin.id, accept=True
+            )
+        self.assertEqual(3, closed)
+
+    def test_only_superusers_can_moderate(self):
+        self.client.force_login(self.user)
+
+        response = self.post("accept_report", self.reports)
+
+        self.assertEqual(403, response.status_code)
+        self.assertEqual([Report.UNDERPROCESS] * 3, self.statuses())
+
+
+class ReportClaimTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory().create()
+        self.admins = [UserFactory().is_superuser().create() for _ in range(2)]
+        self.tag = Tag.objects.create(name="test")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        self.review = Review.objects.create(
+            user=self.user, movie=self.movie, content="test"
+        )
+        self.reports = [
+            Report.objects.create(user=self.user, review=self.review, content="spam")
+            for _ in range(2)
+        ]
+
+    def claim(self, admin):
+        return services.claim_next_report(admin.id)
+
+    def test_moderators_get_distinct_reports(self):
+        first, second = self.reports
+
+        self.assertEqual(first.id, self.claim(self.admins[0]))
+        self.assertEqual(second.id, self.claim(self.admins[1]))
+        self.assertEqual(first.id, self.claim(self.admins[0]))
+
+    def test_empty_queue(self):
+        Report.objects.update(status=Report.SUCCESS)
+
+        self.assertIsNone(self.claim(self.admins[0]))
+
+    def test_expired_claims_return_to_the_queue(self):
+        self.claim(self.admins[0])
+        Report.objects.filter(id=self.reports[0].id).update(
+            claimed_until=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(self.reports[0].id, self.claim(self.admins[1]))
+        claimed = Report.objects.get(id=self.reports[0].id)
+        self.assertEqual(self.admins[1].id, claimed.claimed_by_id)
+
+    def test_release_returns_the_report(self):
+        self.claim(self.admins[0])
+
+        services.release_report(self.reports[0].id, self.admins[0].id)
+
+        self.assertEqual(self.reports[0].id, self.claim(self.admins[1]))
+
+    def test_claim_view_shows_only_the_claimed_report(self):
+        self.claim(self.admins[1])
+        self.client.force_login(self.admins[0])
+
+        response = self.client.post(reverse("reports:claim"), follow=True)
+
+        self.assertEqual(
+            [self.reports[1].id],
+            [report.id for report in response.context["object_list"]],
+        )
+
+    def test_queue_shows_who_holds_a_claim(self):
+        self.claim(self.admins[1])
+        self.client.force_login(self.admins[0])
+
+        response = self.client.get(reverse("reports:list"))
+
+        self.assertContains(response, f"{self.admins[1].username} 處理中")
+
+
+@skipUnless(connection.vendor == "postgresql", "needs SKIP LOCKED")
+class ReportClaimLockTest(TransactionTestCase):
+    def test_rows_being_claimed_are_skipped(self):
+        user = UserFactory().create()
+        admin = UserFactory().is_superuser().create()
+        movie = Movie.objects.create(
+            tag_id=Tag.objects.create(name="test"),
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        review = Review.objects.create(user=user, movie=movie, content="test")
+        first, second = [
+            Report.objects.create(user=user, review=review, content="spam")
+            for _ in range(2)
+        ]
+        locked, done = threading.Event(), threading.Event()
+
+        def hold_first():
+            with transaction.atomic():
+                list(Report.objects.select_for_update().filter(id=first.id))
+                locked.set()
+                done.wait(10)
+            connections.close_all()
+
+        thread = threading.Thread(target=hold_first)
+        thread.start()
+        try:
+            locked.wait(10)
+            self.assertEqual(second.id, services.claim_next_report(admin.id))
+        finally:
+            done.set()
+            thread.join()
+
+
+class ReportServiceQueryTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory().create()
+        self.admin = UserFactory().is_superuser().create()
+        self.tag = Tag.objects.create(name="test")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        self.review = Review.objects.create(
+            user=self.user, movie=self.movie, content="test"
+        )
+        self.movie.rebuild_rating()
+        self.report = Report.objects.create(
+            user=self.user, review=self.review, content="report test"
+        )
+
+    def test_create_report(self):
+        # the review's movie id, the insert and the fragment cache receiver
+        with self.assertNumQueries(3):
+            report = services.create_report(self.user.id, self.review.id, "spam")
+        self.assertEqual(self.movie.id, report.review.movie_id)
+
+    def test_take_back_report(self):
+        with self.assertNumQueries(1):
+            services.take_back_report(self.report.id, self.user.id)
+
+        self.assertEqual(Report.TAKEBACK, Report.objects.get(id=self.report.id).status)
+
+    def test_only_the_reporter_can_take_back(self):
+        services.take_back_report(self.report.id, self.admin.id)
+
+        self.assertEqual(
+            Report.UNDERPROCESS, Report.objects.get(id=self.report.id).status
+        )
+
+    def test_refuse_report(self):
+        with self.assertNumQueries(3):
+            services.handle_report(self.report.id, self.admin.id, accept=False)
+
+    def test_accept_report(self):
+        # update the report, lock and hide the review, update the rating
+        with self.assertNumQueries(7):
+            services.handle_report(self.report.id, self.admin.id, accept=True)
+
+        self.assertTrue(Review.objects.get(id=self.review.id).existed)
@@ -1,12 +1,21 @@
+from django.conf import settings
 from django.urls import path
 
 
 from . import views
 
+# ASYNC_VIEWS serves the read views from coroutines
+if settings.ASYNC_VIEWS:
+    list_view = views.AsyncReportListView.as_view()
+else:
+    list_view = views.ReportListView.as_view()
+
 app_name = "reports"
 urlpatterns = [
     path("reports/create", views.ReportCreatetView.as_view(), name="create"),
     path("reports/<int:pk>/delete", views.ReportDeleteView.as_view(), name="delete"),
     path("reports/<int:pk>/edit", views.ReportReviewView.as_view(), name="edit"),
-    path("reports", views.ReportListView.as_view(), name="list"),
+    path("reports/edit", views.BulkReportReviewView.as_view(), name="bulk-edit"),
+    path("reports/claim", views.ClaimReportView.as_view(), name="claim"),
+    path("reports", list_view, name="list"),
 ]
@@ -1,5 +1,6 @@
 from django.urls import reverse
 from django.shortcuts import render
+from django.contrib.auth.mixins import UserPassesTestMixin
 from django.views import View
 from django.views.generic import (
     CreateView,
@@ -8,82 +9,165 @@ from django.views.generic import (
     UpdateView,
     DeleteView,
 )
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.functions import Now
 from django.http import HttpResponseRedirect, HttpResponse
-from users.models import User
-from review.models import Review
+from movie.models import Movie
+from movie.search import search_movies
+from moreview.asyncviews import AsyncListMixin
+from moreview.pagination import (
+    KeysetPaginationMixin,
+    KeysetPaginator,
+    PaginationQueryMixin,
+)
+from . import services
 from .models import Report
 from .forms import ReportModelForm
 
+
 # Create your views here.
-class ReportListView(ListView):
+class ReportListView(KeysetPaginationMixin, PaginationQueryMixin, ListView):
+    """The user's own reports, or the moderation queue for superusers.
+
+    Both are filtered and joined in SQL and paged with a cursor on
+    (-date_updated, -id), which the report indexes cover.
+    """
+
     model = Report
     report_template_name = "report_list.html"
     report_manage_template_name = "report_review_form.html"
 
+    # columns the two templates show
+    list_fields = [
+        "id",
+        "status",
+        "content",
+        "date_updated",
+        "review__content",
+        "review__movie__name",
+    ]
+    manage_fields = list_fields + [
+        "review__user__username",
+        "user__username",
+        "handler__username",
+        "claimed_by__username",
+    ]
+
     def get_template_names(self, *args, **kwargs):
         if self.request.user.is_superuser:
             return [self.report_manage_template_name]
         else:
             return [self.report_template_name]
 
+    def get_paginate_by(self, queryset):
+        return settings.REPORT_LIST_PAGE_SIZE
+
+    def get_queryset(self):
+        if not self.request.user.is_superuser:
+            return (
+                Report.objects.filter(user_id=self.request.user.id)
+                .select_related("review__movie")
+                .only(*self.list_fields)
+            )
+
+        reports = (
+            Report.objects.exclude(status=Report.TAKEBACK)
+            .select_related(
+                "review__user", "review__movie", "user", "handler", "claimed_by"
+            )
+            .only(*self.manage_fields)
+            .annotate(
+                claim_active=ExpressionWrapper(
+                    Q(claimed_until__gte=Now()), output_field=BooleanField()
+                )
+            )
+        )
+        if self.request.GET.get("claimed"):
+            # the claim-next mode only shows what the moderator holds
+            return reports.filter(
+                status=Report.UNDERPROCESS,
+                claimed_by_id=self.request.user.id,
+                claimed_until__gte=Now(),
+            )
+        status = self.request.GET.get("status")
+        if status in {str(value) for value, _ in Report.REPORT_STATUS}:
+            reports = reports.filter(status=int(status))
+        query = self.request.GET.get("q")
+        if query:
+            movies = search_movies(Movie.objects.all(), query).values("id")
+            reports = reports.filter(review__movie__in=movies)
+        return reports
+
+    def get_keyset_paginator(self, queryset, page_size):
+        return KeysetPaginator(queryset, "-date_updated", page_size)
+
     def get_context_data(self, **kwargs):
         context = super(ReportListView, self).get_context_data(**kwargs)
-
-        if self.request.user.is_superuser:
-            query = self.request.GET.get("q")
-            status = self.request.GET.get("status")
-
-            if query is not None and status != "all":
-                report_obj = Report.objects.filter(
-                    review__movie__name__contains=query, status=status
-                ).order_by("-date_updated")
-            elif query is not None:
-                report_obj = Report.objects.filter(
-                    review__movie__name__contains=query
-                ).order_by("-date_updated")
-            else:
-                report_obj = Report.objects.all().order_by("-date_updated")
-
-            context["status"] = status
-            context["object_list"] = report_obj
-        else:
-            context["object_list"] = Report.objects.filter(
-                user=self.request.user
-            ).order_by("-date_updated")
+        context["status"] = self.request.GET.get("status")
         return context
 
 
+class AsyncReportListView(AsyncListMixin, ReportListView):
+    """ReportListView for ASGI, the page is read with the async ORM."""
+
+
 class ReportCreatetView(View):
     def post(self, request, *args, **kwargs):
-        print(self.request.POST["reviewID"])
-        user = User.objects.get(id=self.request.user.id)
-        review = Review.objects.get(id=request.POST["reviewID"])
-        content = request.POST["content"]
-        report = Report.objects.create(
-            user=user,
-            review=review,
-            content=content,
+        report = services.create_report(
+            request.user.id, request.POST["reviewID"], request.POST["content"]
         )
         return HttpResponseRedirect(
-            reverse("movie:detail", kwargs={"pk": review.movie.pk})
+            reverse("movie:detail", kwargs={"pk": report.review.movie_id})
         )
 
 
 class ReportDeleteView(View):
     def post(self, request, *args, **kwargs):
-        report = Report.objects.filter(id=self.kwargs["pk"])
-        report.update(status=3)
+        services.take_back_report(self.kwargs["pk"], request.user.id)
         return HttpResponseRedirect(reverse("reports:list"))
 
 
 class ReportReviewView(View):
     def post(self, request, *args, **kwargs):
-        report = Report.objects.filter(id=self.kwargs["pk"])
-        review = Review.objects.filter(id=report[0].review.id)
         if "accept_report" in request.POST.keys():
-            report.update(status=1, handler=self.request.user)
-            review.update(existed=True)
+            services.handle_report(self.kwargs["pk"], request.user.id, accept=True)
         elif "refuse_report" in request.POST.keys():
-            report.update(status=2, handler=self.request.user)
+            services.handle_report(self.kwargs["pk"], request.user.id, accept=False)
+
+        return HttpResponseRedirect(reverse("reports:list"))
+
+
+class BulkReportReviewView(UserPassesTestMixin, View):
+    """Accept or refuse every report checked in the moderation queue."""
+
+    def test_func(self):
+        return self.request.user.is_superuser
+
+    def post(self, request, *args, **kwargs):
+        report_ids = [
+            int(value)
+            for value in request.POST.getlist("report_ids")
+            if value.isdigit()
+        ]
+        if report_ids and "accept_report" in request.POST.keys():
+            services.handle_reports(report_ids, request.user.id, accept=True)
+        elif report_ids and "refuse_report" in request.POST.keys():
+            services.handle_reports(report_ids, request.user.id, accept=False)
 
         return HttpResponseRedirect(reverse("reports:list"))
+
+
+class ClaimReportView(UserPassesTestMixin, View):
+    """Lease the next pending report to the moderator and show only it."""
+
+    def test_func(self):
+        return self.request.user.is_superuser
+
+    def post(self, request, *args, **kwargs):
+        if "release_report" in request.POST.keys():
+            services.release_report(request.POST["reportID"], request.user.id)
+            return HttpResponseRedirect(reverse("reports:list"))
+
+        services.claim_next_report(request.user.id)
+        return HttpResponseRedirect(reverse("reports:list") + "?claimed=1")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from review.models import Review
+
+
+class Command(BaseCommand):
+    help = "Repair review heart counts that drifted from the heart table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movie", type=int, help="Only reconcile one movie")
+
+    def handle(self, *args, **options):
+        reviews = Review.objects.all()
+        if options["movie"]:
+            reviews = reviews.filter(movie_id=options["movie"])
+
+        fixed = Review.reconcile_heart_counts(reviews)
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed} reviews"))
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_hearts(apps, schema_editor):
+    Review = apps.get_model("review", "Review")
+    Heart = apps.get_model("review", "Heart")
+    hearts = (
+        Heart.objects.filter(review=OuterRef("pk"))
+        .order_by()
+        .values("review")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Review.objects.update(
+        heart_count=Coalesce(Subquery(hearts, output_field=models.IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("review", "0004_alter_review_content"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="review",
+            name="heart_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["movie", "heart_count"], name="review_movie_heart_idx"
+            ),
+        ),
+        migrations.RunPython(count_hearts, migrations.RunPython.noop),
+    ]
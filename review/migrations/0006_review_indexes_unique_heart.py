@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:31
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_hearts(apps, schema_editor):
+    Review = apps.get_model("review", "Review")
+    Heart = apps.get_model("review", "Heart")
+    duplicates = (
+        Heart.objects.values("user", "review")
+        .annotate(keep=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    review_ids = set()
+    for duplicate in duplicates:
+        Heart.objects.filter(
+            user=duplicate["user"], review=duplicate["review"]
+        ).exclude(id=duplicate["keep"]).delete()
+        review_ids.add(duplicate["review"])
+
+    hearts = (
+        Heart.objects.filter(review=OuterRef("pk"))
+        .order_by()
+        .values("review")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Review.objects.filter(id__in=review_ids).update(
+        heart_count=Coalesce(Subquery(hearts, output_field=models.IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("review", "0005_review_heart_count"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="review",
+            name="review_movie_heart_idx",
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["movie", "date_created", "id"], name="review_movie_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["movie", "heart_count", "id"], name="review_movie_heart_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["movie", "rating", "id"], name="review_movie_rating_idx"
+            ),
+        ),
+        migrations.RunPython(remove_duplicate_hearts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="heart",
+            constraint=models.UniqueConstraint(
+                fields=("user", "review"), name="unique_heart"
+            ),
+        ),
+    ]
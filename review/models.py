@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from users.models import User
 from movie.models import Movie
 from django.urls import reverse
@@ -26,12 +28,53 @@ class Review(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
     existed = models.BooleanField(default=False)
+    heart_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["movie", "date_created", "id"], name="review_movie_created_idx"
+            ),
+            models.Index(
+                fields=["movie", "heart_count", "id"], name="review_movie_heart_idx"
+            ),
+            models.Index(
+                fields=["movie", "rating", "id"], name="review_movie_rating_idx"
+            ),
+        ]
 
     def get_absolute_url(self):
         return reverse("movie:detail", kwargs={"pk": self.movie.pk})
 
+    @classmethod
+    def reconcile_heart_counts(cls, queryset=None):
+        """Reset `heart_count` to the real number of hearts where it drifted.
+
+        Returns the number of reviews that were repaired.
+        """
+        hearts = (
+            Heart.objects.filter(review=OuterRef("pk"))
+            .order_by()
+            .values("review")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        actual = Coalesce(Subquery(hearts, output_field=models.IntegerField()), 0)
+        if queryset is None:
+            queryset = cls.objects.all()
+        return (
+            queryset.annotate(actual_heart_count=actual)
+            .exclude(heart_count=F("actual_heart_count"))
+            .update(heart_count=actual)
+        )
+
 
 class Heart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     review = models.ForeignKey(Review, on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "review"], name="unique_heart"),
+        ]
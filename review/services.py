@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from movie.models import Movie
+
+from .models import Heart, Review
+
+# What the review card and the rating update read from a review
+REVIEW_FIELDS = ["id", "user_id", "movie_id", "rating", "existed", "heart_count"]
+
+
+def create_review(user_id, movie_id, content, rating):
+    """Add a review and count its rating, referring to the user and movie by id."""
+    with transaction.atomic():
+        movie = Movie.lock_rating(movie_id)
+        # the cache receivers read the locked movie instead of selecting it
+        review = Review.objects.create(
+            user_id=user_id, movie=movie, content=content, rating=rating
+        )
+        movie.apply_rating(added=rating)
+    return review
+
+
+def edit_review(review_id, content, rating):
+    with transaction.atomic():
+        review = (
+            Review.objects.select_for_update().only(*REVIEW_FIELDS).get(id=review_id)
+        )
+        old_rating = review.rating
+        rating_changed = not review.existed and old_rating != rating
+        if rating_changed:
+            review.movie = Movie.lock_rating(review.movie_id)
+        review.content = content
+        review.rating = rating
+        # save() bumps date_updated and sends the signals the caches rely on
+        review.save(update_fields=["content", "rating", "date_updated"])
+        if rating_changed:
+            review.movie.apply_rating(added=rating, removed=old_rating)
+    return review
+
+
+def delete_review(review_id):
+    with transaction.atomic():
+        review = (
+            Review.objects.select_for_update().only(*REVIEW_FIELDS).get(id=review_id)
+        )
+        if not review.existed:
+            review.movie = Movie.lock_rating(review.movie_id)
+        review.delete()
+        if not review.existed:
+            review.movie.apply_rating(removed=review.rating)
+    return review
+
+
+def set_heart(user_id, review_id, hearted):
+    """Make the user's heart on a review match `hearted`.
+
+    Returns the review with its new heart count. The review row is locked so
+    concurrent requests for it apply one at a time and the count is exact.
+    """
+    with transaction.atomic():
+        review = (
+            Review.objects.select_for_update()
+            .only("id", "movie_id", "heart_count")
+            .get(id=review_id)
+        )
+        if hearted:
+            # A repeated click must not break the unique (user, review) pair;
+            # passing the review lets the page cache receiver read its movie
+            _, created = Heart.objects.get_or_create(user_id=user_id, review=review)
+            step = 1 if created else 0
+        else:
+            heart = Heart.objects.filter(user_id=user_id, review_id=review_id).first()
+            step = 0
+            if heart is not None:
+                heart.review = review
+                heart.delete()
+                step = -1
+        if step:
+            Review.objects.filter(id=review_id).update(
+                heart_count=Greatest(F("heart_count") + step, 0)
+            )
+            review.heart_count = max(review.heart_count + step, 0)
+    return review
@@ -1,13 +1,20 @@
+from django.core.management import call_command
+from django.db import IntegrityError, connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 import time
+from decimal import Decimal
+from io import StringIO
 
 from faker import Faker
 from movie.models import Movie, Tag
+from review import services
 from review.models import Review, Heart
 from review.views import *
 from users.factories import UserFactory
 
+
 # Create your tests here.
 class ReviewModelTest(TestCase):
     def setUp(self):
@@ -81,6 +88,10 @@ class HeartModelTest(TestCase):
 
         self.assertEqual(0, heart_count)
 
+    def test_user_can_heart_a_review_only_once(self):
+        with self.assertRaises(IntegrityError):
+            Heart.objects.create(user=self.user, review=self.review)
+
 
 class ReviewCreateTest(TestCase):
     def setUp(self):
@@ -113,6 +124,33 @@ class ReviewCreateTest(TestCase):
             response, expected_url=reverse("movie:detail", kwargs={"pk": self.movie.pk})
         )
 
+    def test_review_create_updates_movie_rating(self):
+        self.client.login(username=self.user.username, password="Passw0rd!")
+        self.client.post(reverse("review:create"), self.form)
+        self.movie.refresh_from_db()
+        rating = self.form["rating"]
+
+        self.assertEqual(1, self.movie.review_count)
+        self.assertEqual(rating, self.movie.rating_sum)
+        self.assertEqual(1, getattr(self.movie, f"rating_{rating}_count"))
+        self.assertEqual(Decimal(rating), self.movie.average_rating)
+
+    def test_json_create_returns_the_new_card_and_rating(self):
+        self.client.force_login(self.user)
+        self.form["content"] = "a new review"
+
+        response = self.client.post(
+            reverse("review:create"), self.form, HTTP_ACCEPT="application/json"
+        )
+        data = response.json()
+
+        review = Review.objects.get(movie=self.movie)
+        self.assertEqual(review.id, data["review"])
+        self.assertIn(f'id="review{review.id}"', data["review_html"])
+        self.assertIn("a new review", data["review_html"])
+        self.assertIn(f"{self.form['rating']}.00", data["rating_html"])
+        self.assertIn("(1)", data["rating_html"])
+
 
 class ReviewDeleteTest(TestCase):
     def setUp(self):
@@ -132,6 +170,7 @@ class ReviewDeleteTest(TestCase):
         self.review = Review.objects.create(
             user=self.user, movie=self.movie, content="test"
         )
+        self.movie.rebuild_rating()
         self.form = {"movieID": self.movie.id, "reviewID": self.review.id}
 
     def test_review_delete_can_work(self):
@@ -144,6 +183,29 @@ class ReviewDeleteTest(TestCase):
             response, expected_url=reverse("movie:detail", kwargs={"pk": self.movie.pk})
         )
 
+    def test_review_delete_updates_movie_rating(self):
+        self.client.post(
+            reverse("review:delete", kwargs={"pk": self.review.pk}), self.form
+        )
+        self.movie.refresh_from_db()
+
+        self.assertEqual(0, self.movie.review_count)
+        self.assertEqual(0, self.movie.rating_3_count)
+        self.assertIsNone(self.movie.average_rating)
+
+    def test_json_delete_returns_only_the_rating(self):
+        response = self.client.post(
+            reverse("review:delete", kwargs={"pk": self.review.pk}),
+            self.form,
+            HTTP_ACCEPT="application/json",
+        )
+        data = response.json()
+
+        self.assertIsNone(data["review"])
+        self.assertEqual("", data["review_html"])
+        self.assertIn('id="rating_summary"', data["rating_html"])
+        self.assertNotIn("(1)", data["rating_html"])
+
 
 class ReviewEditTest(TestCase):
     def setUp(self):
@@ -165,6 +227,7 @@ class ReviewEditTest(TestCase):
             movie=self.movie,
             content="test",
         )
+        self.movie.rebuild_rating()
         self.form = {
             "movieID": self.movie.id,
             "reviewID": self.review.id,
@@ -183,6 +246,35 @@ class ReviewEditTest(TestCase):
             response, expected_url=reverse("movie:detail", kwargs={"pk": self.movie.pk})
         )
 
+    def test_review_edit_updates_movie_rating(self):
+        self.client.post(
+            reverse("review:edit", kwargs={"pk": self.review.pk}), self.form
+        )
+        self.movie.refresh_from_db()
+
+        self.assertEqual(1, self.movie.review_count)
+        self.assertEqual(1, self.movie.rating_sum)
+        self.assertEqual(0, self.movie.rating_3_count)
+        self.assertEqual(1, self.movie.rating_1_count)
+        self.assertEqual(Decimal("1.00"), self.movie.average_rating)
+
+    def test_json_edit_returns_the_updated_card(self):
+        self.client.force_login(self.user)
+        Heart.objects.create(user=self.user, review=self.review)
+
+        response = self.client.post(
+            reverse("review:edit", kwargs={"pk": self.review.pk}),
+            self.form,
+            HTTP_ACCEPT="application/json",
+        )
+        data = response.json()
+
+        self.assertEqual(self.review.id, data["review"])
+        self.assertIn("test edit", data["review_html"])
+        # the edit form's rating radio and the heart checkbox
+        self.assertEqual(2, data["review_html"].count("checked"))
+        self.assertIn("1.00", data["rating_html"])
+
 
 class HeartCreateTest(TestCase):
     def setUp(self):
@@ -218,10 +310,24 @@ class HeartCreateTest(TestCase):
         self.assertEqual(
             1, Heart.objects.filter(user=self.user.id, review=self.review.id).count()
         )
+        self.assertEqual(1, Review.objects.get(id=self.review.id).heart_count)
         self.assertRedirects(
             response, expected_url=reverse("movie:detail", kwargs={"pk": self.movie.pk})
         )
 
+    def test_repeated_heart_does_not_duplicate(self):
+        self.client.login(username=self.user.username, password="Passw0rd!")
+        self.form["heart"] = ""
+        for _ in range(2):
+            self.client.post(
+                reverse("review:heart", kwargs={"pk": self.review.pk}), self.form
+            )
+
+        self.assertEqual(
+            1, Heart.objects.filter(user=self.user.id, review=self.review.id).count()
+        )
+        self.assertEqual(1, Review.objects.get(id=self.review.id).heart_count)
+
     def test_heart_delete_can_work(self):
         self.client.login(username=self.user.username, password="Passw0rd!")
         Heart.objects.create(user=self.user, review=self.review)
@@ -233,6 +339,116 @@ class HeartCreateTest(TestCase):
         self.assertEqual(
             0, Heart.objects.filter(user=self.user.id, review=self.review.id).count()
         )
+        self.assertEqual(0, Review.objects.get(id=self.review.id).heart_count)
         self.assertRedirects(
             response, expected_url=reverse("movie:detail", kwargs={"pk": self.movie.pk})
         )
+
+    def test_json_heart_returns_state_and_count(self):
+        self.client.force_login(self.user)
+        url = reverse("review:heart", kwargs={"pk": self.review.pk})
+
+        response = self.client.post(
+            url, {**self.form, "heart": "on"}, HTTP_ACCEPT="application/json"
+        )
+        self.assertEqual(
+            {"review": self.review.id, "hearted": True, "heart_count": 1},
+            response.json(),
+        )
+
+        response = self.client.post(url, self.form, HTTP_ACCEPT="application/json")
+        self.assertEqual(
+            {"review": self.review.id, "hearted": False, "heart_count": 0},
+            response.json(),
+        )
+
+    def test_json_heart_is_idempotent(self):
+        self.client.force_login(self.user)
+        url = reverse("review:heart", kwargs={"pk": self.review.pk})
+        for state in [{"heart": "on"}, {"heart": "on"}, {}, {}]:
+            response = self.client.post(
+                url, {**self.form, **state}, HTTP_ACCEPT="application/json"
+            )
+            self.assertEqual(bool(state), response.json()["hearted"])
+            self.assertEqual(int(bool(state)), response.json()["heart_count"])
+
+        self.assertEqual(0, Heart.objects.filter(review=self.review).count())
+
+    def test_json_heart_skips_the_detail_page(self):
+        self.client.force_login(self.user)
+        url = reverse("review:heart", kwargs={"pk": self.review.pk})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                url, {**self.form, "heart": "on"}, HTTP_ACCEPT="application/json"
+            )
+
+        self.assertEqual("application/json", response["Content-Type"])
+        self.assertFalse(any('"movie_movie"' in q["sql"] for q in queries))
+
+    def test_reconcile_heart_counts_command_repairs_drift(self):
+        other = UserFactory().create()
+        Heart.objects.create(user=self.user, review=self.review)
+        Heart.objects.create(user=other, review=self.review)
+        out = StringIO()
+
+        call_command("reconcile_heart_counts", stdout=out)
+
+        self.assertEqual(2, Review.objects.get(id=self.review.id).heart_count)
+        self.assertIn("Repaired 1 reviews", out.getvalue())
+
+
+class ReviewServiceQueryTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory().create()
+        self.tag = Tag.objects.create(name="test")
+        self.movie = Movie.objects.create(
+            tag_id=self.tag,
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        self.review = services.create_review(self.user.id, self.movie.id, "test", 3)
+
+    def test_create_review(self):
+        # a savepoint pair, lock the movie, insert, update the rating
+        with self.assertNumQueries(5):
+            services.create_review(self.user.id, self.movie.id, "another", 4)
+
+    def test_edit_review(self):
+        # a savepoint pair, lock and update the review and the movie
+        with self.assertNumQueries(6):
+            services.edit_review(self.review.id, "edited", 5)
+
+    def test_edit_review_without_rating_change_skips_the_movie(self):
+        with self.assertNumQueries(5):
+            services.edit_review(self.review.id, "edited", 3)
+
+    def test_delete_review(self):
+        # lock the review and the movie, collect hearts, cascade reports,
+        # delete, update the rating
+        with self.assertNumQueries(8):
+            services.delete_review(self.review.id)
+
+    def test_set_heart(self):
+        # lock, get_or_create with its savepoint, update the count
+        with self.assertNumQueries(8):
+            services.set_heart(self.user.id, self.review.id, True)
+
+    def test_repeated_heart_only_reads(self):
+        services.set_heart(self.user.id, self.review.id, True)
+
+        with self.assertNumQueries(4):
+            review = services.set_heart(self.user.id, self.review.id, True)
+        self.assertEqual(1, review.heart_count)
+
+    def test_remove_heart(self):
+        services.set_heart(self.user.id, self.review.id, True)
+
+        with self.assertNumQueries(6):
+            review = services.set_heart(self.user.id, self.review.id, False)
+        self.assertEqual(0, review.heart_count)
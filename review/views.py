@@ -1,61 +1,108 @@
 from django.urls import reverse
 from django.shortcuts import render
-from django.http import HttpResponseRedirect, HttpResponse
+from django.template.loader import render_to_string
+from django.http import HttpResponseRedirect, HttpResponse, JsonResponse
 
 from django.views import View
 
-from users.models import User
 from movie.models import Movie
 from review.models import Review, Heart
+from reports.forms import ReportModelForm
+from . import services
 from .forms import ReviewModelForm
 
+
+def wants_json(request):
+    """Whether the request comes from the page scripts rather than a form."""
+    return "application/json" in request.headers.get("Accept", "")
+
+
+def review_response(request, movie_id, review=None, hearted=False):
+    """Answer a review write.
+
+    Form posts are redirected to the detail page. Scripts get JSON with the
+    rendered card of the written review, empty after a delete, and the
+    movie's new rating summary.
+    """
+    if not wants_json(request):
+        return HttpResponseRedirect(reverse("movie:detail", kwargs={"pk": movie_id}))
+
+    movie = Movie.objects.only("id", "review_count", "average_rating").get(id=movie_id)
+    data = {
+        "review": None,
+        "review_html": "",
+        "rating_html": render_to_string(
+            "rating_summary.html", {"movie": movie}, request=request
+        ),
+    }
+    if review is not None:
+        if review.user_id == request.user.id:
+            review.user = request.user
+        context = {
+            "review": review,
+            "movie": movie,
+            "heart_list": {review.id} if hearted else set(),
+            "self_report_list": set(),
+            "report_create_form": ReportModelForm(),
+        }
+        data["review"] = review.id
+        data["review_html"] = render_to_string(
+            "review_card.html", context, request=request
+        )
+    return JsonResponse(data)
+
+
 # Create your views here.
 class ReviewCreateView(View):
     def post(self, request, *args, **kwargs):
-        movie = Movie.objects.get(id=request.POST["movieID"])
-        user = User.objects.get(id=self.request.user.id)
-        content = request.POST["content"]
-        rating = int(request.POST["rating"])
-        review = Review.objects.create(
-            user=user, movie=movie, content=content, rating=rating
-        )
-        return HttpResponseRedirect(
-            reverse("movie:detail", kwargs={"pk": review.movie.pk})
+        review = services.create_review(
+            request.user.id,
+            int(request.POST["movieID"]),
+            request.POST["content"],
+            int(request.POST["rating"]),
         )
+        return review_response(request, review.movie_id, review)
 
 
 class ReviewDeleteView(View):
     def post(self, request, *args, **kwargs):
-        movie = Movie.objects.get(id=request.POST["movieID"])
-        review = Review.objects.get(id=request.POST["reviewID"]).delete()
-
-        return HttpResponseRedirect(reverse("movie:detail", kwargs={"pk": movie.pk}))
+        review = services.delete_review(request.POST["reviewID"])
+        return review_response(request, review.movie_id)
 
 
 class ReviewEditView(View):
     def post(self, request, *args, **kwargs):
-        movie = Movie.objects.get(id=request.POST["movieID"])
-        content = request.POST["content"]
-        rating = int(request.POST["rating"])
-        review = Review.objects.filter(id=request.POST["reviewID"]).update(
-            content=content, rating=rating
+        review = services.edit_review(
+            request.POST["reviewID"],
+            request.POST["content"],
+            int(request.POST["rating"]),
+        )
+        hearted = wants_json(request) and (
+            Heart.objects.filter(user_id=request.user.id, review_id=review.id).exists()
         )
-        return HttpResponseRedirect(reverse("movie:detail", kwargs={"pk": movie.pk}))
+        return review_response(request, review.movie_id, review, hearted)
 
 
 class HeartView(View):
+    """Set whether the user hearts a review.
+
+    The form sends the wanted state rather than a toggle ("heart" present or
+    not), so double clicks and retried requests end in the same state.
+    Clients asking for JSON get the new state instead of a redirect to the
+    whole detail page.
+    """
+
     def post(self, request, *args, **kwargs):
-        review = Review.objects.get(id=request.POST["reviewID"])
-        user = User.objects.get(id=self.request.user.id)
-        post_keys = request.POST.keys()
-        if "heart" in post_keys:
-            Heart.objects.create(
-                user=user,
-                review=review,
+        hearted = "heart" in request.POST
+        review = services.set_heart(request.user.id, request.POST["reviewID"], hearted)
+        if wants_json(request):
+            return JsonResponse(
+                {
+                    "review": review.id,
+                    "hearted": hearted,
+                    "heart_count": review.heart_count,
+                }
             )
-        else:
-            Heart.objects.get(user=user, review=review).delete()
-
         return HttpResponseRedirect(
-            reverse("movie:detail", kwargs={"pk": review.movie.pk})
+            reverse("movie:detail", kwargs={"pk": review.movie_id})
         )
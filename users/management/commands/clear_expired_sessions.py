@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions a batch at a time, so the sweep never holds "
+        "long locks on the session table. Meant to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.SESSION_CLEAR_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--max-batches", type=int, help="Stop after this many batches"
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+
+        deleted = batches = 0
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            keys = list(
+                expired.values_list("session_key", flat=True)[: options["batch_size"]]
+            )
+            if not keys:
+                break
+            count, _ = Session.objects.filter(session_key__in=keys).delete()
+            deleted += count
+            batches += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} expired sessions in {batches} batches"
+            )
+        )
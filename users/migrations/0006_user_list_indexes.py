@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:28
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# icontains compares UPPER(column::text), so the indexes cover that expression
+SEARCH_COLUMNS = ["username", "email"]
+
+
+def create_search_indexes(apps, schema_editor):
+    # Only PostgreSQL has trigram indexes; elsewhere the search scans
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f"CREATE INDEX users_user_{column}_trgm_idx ON users_user "
+            f"USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS users_user_{column}_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_alter_user_date_updated"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_superuser", False)),
+                fields=["date_joined", "id"],
+                name="user_member_joined_idx",
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -10,3 +10,13 @@ class User(AbstractUser):
     date_updated = models.DateTimeField(auto_now=True)
 
     REQUIRED_FIELDS = ["first_name", "last_name", "email"]
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # the admin user list pages the non-admins by date joined
+            models.Index(
+                fields=["date_joined", "id"],
+                condition=models.Q(is_superuser=False),
+                name="user_member_joined_idx",
+            ),
+        ]
@@ -1,11 +1,24 @@
 from django import forms
 from django.contrib import auth
+from django.conf import settings
 from django.contrib.auth.forms import PasswordChangeForm
-from django.db import models
-from django.test import Client, TestCase, RequestFactory
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import Client, TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext as _
+from datetime import timedelta
 from faker import Faker
+from io import StringIO
+
+from movie.models import Movie, Tag
+from reports.models import Report
+from review.models import Heart, Review
 
 from users.factories import UserFactory
 from .forms import RegisterForm, ProfileUpdateForm, AdminCreateForm
@@ -262,6 +275,80 @@ class UserListViewTest(TestCase):
         self.assertEqual(200, response.status_code)
 
 
+class UserListStatsTest(TestCase):
+    def setUp(self):
+        self.admin = UserFactory().is_superuser().create()
+        self.users = [UserFactory().create() for _ in range(3)]
+        self.client.force_login(self.admin)
+
+    def listed(self, response):
+        return [user.username for user in response.context["object_list"]]
+
+    def test_rows_carry_activity_stats(self):
+        user, other, _ = self.users
+        movie = Movie.objects.create(
+            tag_id=Tag.objects.create(name="test"),
+            name="test",
+            content="test content",
+            official_site="test url",
+            time=120,
+            image="test.jpg",
+            grade="普遍級",
+            date_released="2022-12-12",
+        )
+        review = Review.objects.create(user=user, movie=movie, content="test")
+        Review.objects.create(user=user, movie=movie, content="again")
+        Heart.objects.create(user=user, review=review)
+        report = Report.objects.create(user=user, review=review, content="spam")
+
+        response = self.client.get(reverse("users:list"))
+
+        rows = {row.username: row for row in response.context["object_list"]}
+        self.assertEqual(2, rows[user.username].review_total)
+        self.assertEqual(1, rows[user.username].heart_total)
+        self.assertEqual(1, rows[user.username].report_total)
+        self.assertEqual(report.date_updated, rows[user.username].last_activity)
+        self.assertEqual(0, rows[other.username].review_total)
+        self.assertEqual(other.date_joined, rows[other.username].last_activity)
+
+    def test_admins_are_listed_apart(self):
+        response = self.client.get(reverse("users:list"))
+
+        self.assertEqual([self.admin], list(response.context["admin_list"]))
+        self.assertNotIn(self.admin.username, self.listed(response))
+
+    def test_search_by_username_or_email(self):
+        user = self.users[1]
+
+        for query in [user.username, user.email.upper()]:
+            response = self.client.get(reverse("users:list"), {"q": query})
+            self.assertEqual([user.username], self.listed(response))
+
+    @override_settings(USER_LIST_PAGE_SIZE=2)
+    def test_users_page_with_a_cursor(self):
+        response = self.client.get(reverse("users:list"))
+        self.assertEqual(
+            [user.username for user in self.users[:2]], self.listed(response)
+        )
+
+        response = self.client.get(
+            reverse("users:list"), {"cursor": response.context["page_obj"].next_cursor}
+        )
+        self.assertEqual([self.users[2].username], self.listed(response))
+
+    def test_page_is_one_query_for_the_users(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("users:list"))
+
+        self.assertEqual(
+            1,
+            sum(
+                'FROM "users_user"' in q["sql"] and "review" in q["sql"]
+                for q in queries
+            ),
+        )
+
+
 class UserProfileViewTest(TestCase):
     def setUp(self) -> None:
         self.faker = Faker()
@@ -470,7 +557,9 @@ class ProfileUpdateViewTest(TestCase):
         self.client.login(username=self.user.username, password="Passw0rd!")
         response = self.client.post(reverse("users:edit-profile"), failed_data)
 
-        self.assertRedirects(response, reverse("users:profile"))
+        self.assertRedirects(
+            response, reverse("users:profile"), fetch_redirect_response=False
+        )
         self.assertIn("profile-update-form", self.client.session.keys())
         self.assertEqual(failed_data, self.client.session["profile-update-form"])
 
@@ -663,7 +752,9 @@ class UserResetPasswordViewTest(TestCase):
         response = self.client.post(reverse("users:reset-password"), failed_input)
 
         self.assertRedirects(
-            response, expected_url=f"{reverse('users:profile')}#reset-password"
+            response,
+            expected_url=f"{reverse('users:profile')}#reset-password",
+            fetch_redirect_response=False,
         )
         self.assertIn("reset-password-form", self.client.session.keys())
         self.assertEqual(failed_input, self.client.session["reset-password-form"])
@@ -746,3 +837,79 @@ class UserStatusUpdateViewTest(TestCase):
         self.assertEqual(
             1, User.objects.filter(pk=self.user.pk, is_active=True).count()
         )
+
+
+class SessionStorageTest(TestCase):
+    def setUp(self):
+        self.faker = Faker()
+        self.user = UserFactory().create()
+        self.client.login(username=self.user.username, password="Passw0rd!")
+
+    def test_failed_input_is_shown_once(self):
+        failed_data = {
+            "first_name": self.faker.first_name(),
+            "last_name": self.faker.last_name(),
+            "email": self.faker.first_name(),
+        }
+        self.client.post(reverse("users:edit-profile"), failed_data)
+
+        response = self.client.get(reverse("users:profile"))
+
+        self.assertTrue(response.context["profile_update_form"].errors)
+        self.assertNotIn("profile-update-form", self.client.session.keys())
+        response = self.client.get(reverse("users:profile"))
+        self.assertFalse(response.context["profile_update_form"].errors)
+
+    def test_successful_update_drops_failed_input(self):
+        session = self.client.session
+        session["profile-update-form"] = {"email": "wrong"}
+        session.save()
+
+        self.client.post(
+            reverse("users:edit-profile"),
+            {"first_name": "a", "last_name": "b", "email": "a@example.com"},
+        )
+
+        self.assertNotIn("profile-update-form", self.client.session.keys())
+
+    def test_session_reads_through_the_cache(self):
+        session_key = self.client.session.session_key
+
+        with self.assertNumQueries(0):
+            SessionStore(session_key).load()
+
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        with self.assertNumQueries(1):
+            SessionStore(session_key).load()
+
+
+class ClearExpiredSessionsCommandTest(TestCase):
+    def create_session(self, expire_date):
+        session = SessionStore()
+        session.create()
+        Session.objects.filter(session_key=session.session_key).update(
+            expire_date=expire_date
+        )
+        return session.session_key
+
+    def test_deletes_expired_sessions_in_batches(self):
+        now = timezone.now()
+        for _ in range(5):
+            self.create_session(now - timedelta(days=1))
+        live = self.create_session(now + timedelta(days=1))
+        out = StringIO()
+
+        call_command("clear_expired_sessions", batch_size=2, stdout=out)
+
+        self.assertEqual([live], list(Session.objects.values_list("pk", flat=True)))
+        self.assertIn("Deleted 5 expired sessions in 3 batches", out.getvalue())
+
+    def test_stops_after_max_batches(self):
+        for _ in range(5):
+            self.create_session(timezone.now() - timedelta(days=1))
+
+        call_command(
+            "clear_expired_sessions", batch_size=2, max_batches=1, stdout=StringIO()
+        )
+
+        self.assertEqual(3, Session.objects.count())
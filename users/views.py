@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.hashers import make_password
@@ -10,7 +11,11 @@ from django.views.generic.detail import DetailView
 from django.views.generic.edit import FormView, CreateView, UpdateView
 from django.views.generic.list import ListView
 from django.contrib import messages
-from moreview import settings
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from moreview.pagination import KeysetPaginator, PaginationQueryMixin
+from reports.models import Report
+from review.models import Heart, Review
 from .forms import RegisterForm, ProfileUpdateForm, AdminCreateForm
 from .models import User
 from django.utils.translation import gettext as _
@@ -44,7 +49,25 @@ class UserLogoutView(LogoutView):
         return ""
 
 
-class UserListView(UserPassesTestMixin, ListView):
+def user_stat(model, aggregate):
+    """Correlated subquery aggregating the rows of `model` by the outer user."""
+    return Subquery(
+        model.objects.filter(user=OuterRef("pk"))
+        .order_by()
+        .values("user")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+
+
+class UserListView(UserPassesTestMixin, PaginationQueryMixin, ListView):
+    """Admins, then one page of the other users with their activity.
+
+    The counts and the last activity are correlated subqueries, so a page is
+    a single query whatever the number of users. Users page with a cursor on
+    (date_joined, id).
+    """
+
     template_name = "user_list.html"
     model = User
     login_url = reverse_lazy("users:login")
@@ -52,14 +75,49 @@ class UserListView(UserPassesTestMixin, ListView):
     def test_func(self):
         return self.request.user.is_superuser
 
+    def get_paginate_by(self, queryset):
+        return settings.USER_LIST_PAGE_SIZE
+
+    def get_queryset(self):
+        users = User.objects.filter(is_superuser=False)
+        query = self.request.GET.get("q", "").strip()
+        if query:
+            # trigram indexes on PostgreSQL, see migration 0006
+            users = users.filter(
+                Q(username__icontains=query) | Q(email__icontains=query)
+            )
+
+        latest = [
+            Coalesce(value, "date_joined")
+            for value in [
+                F("last_login"),
+                user_stat(Review, Max("date_updated")),
+                user_stat(Heart, Max("date_created")),
+                user_stat(Report, Max("date_updated")),
+            ]
+        ]
+        return users.annotate(
+            review_total=Coalesce(user_stat(Review, Count("id")), 0),
+            heart_total=Coalesce(user_stat(Heart, Count("id")), 0),
+            report_total=Coalesce(user_stat(Report, Count("id")), 0),
+            last_activity=Greatest(*latest),
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        page = KeysetPaginator(queryset, "date_joined", page_size).get_page(
+            self.request.GET.get("cursor")
+        )
+        return None, page, page.object_list, page.has_next
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(object_list=object_list, **kwargs)
+        # a failed submission is shown once, then dropped from the session
+        failed_input = self.request.session.pop("admin-create-form", None)
         context["form"] = (
-            AdminCreateForm(data=self.request.session.get("admin-create-form"))
-            if self.request.session.get("admin-create-form")
-            else AdminCreateForm()
+            AdminCreateForm(data=failed_input) if failed_input else AdminCreateForm()
         )
-        context["object_list"] = User.objects.all().order_by("id")
+        context["admin_list"] = User.objects.filter(is_superuser=True).order_by("id")
+        context["q"] = self.request.GET.get("q", "")
 
         return context
 
@@ -79,17 +137,16 @@ class UserProfileView(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        profile_input = self.request.session.pop("profile-update-form", None)
         context["profile_update_form"] = (
-            ProfileUpdateForm(data=self.request.session.get("profile-update-form"))
-            if self.request.session.get("profile-update-form")
+            ProfileUpdateForm(data=profile_input)
+            if profile_input
             else ProfileUpdateForm(instance=self.object)
         )
+        password_input = self.request.session.pop("reset-password-form", None)
         context["reset_password_form"] = (
-            PasswordChangeForm(
-                user=self.request.user,
-                data=self.request.session.get("reset-password-form"),
-            )
-            if self.request.session.get("reset-password-form")
+            PasswordChangeForm(user=self.request.user, data=password_input)
+            if password_input
             else PasswordChangeForm(user=self.request.user)
         )
         return context
@@ -109,11 +166,11 @@ class ProfileUpdateView(LoginRequiredMixin, UpdateView):
         return super().post(request, *args, **kwargs)
 
     def form_valid(self, form):
-        self.request.session["profile-update-form"] = None
+        self.request.session.pop("profile-update-form", None)
         return super().form_valid(form)
 
     def form_invalid(self, form):
-        self.request.session["profile-update-form"] = form.data
+        self.request.session["profile-update-form"] = form.data.dict()
         return redirect(reverse("users:profile"))
 
 
@@ -132,11 +189,11 @@ class AdminCreateView(UserPassesTestMixin, CreateView):
     def form_valid(self, form):
         form.instance.password = make_password(form.instance.password)
         form.instance.is_superuser = True
-        self.request.session["admin-create-form"] = None
+        self.request.session.pop("admin-create-form", None)
         return super().form_valid(form)
 
     def form_invalid(self, form):
-        self.request.session["admin-create-form"] = form.data
+        self.request.session["admin-create-form"] = form.data.dict()
         return redirect(f"{reverse('users:list')}#create-admin")
 
 
@@ -171,12 +228,12 @@ class UserResetPasswordView(LoginRequiredMixin, PasswordChangeView):
         return super().post(request, *args, **kwargs)
 
     def form_valid(self, form):
-        self.request.session["reset-password-form"] = None
+        self.request.session.pop("reset-password-form", None)
         messages.success(self.request, _("Reset password successfully"))
         return super().form_valid(form)
 
     def form_invalid(self, form):
-        self.request.session["reset-password-form"] = form.data
+        self.request.session["reset-password-form"] = form.data.dict()
         return redirect(f"{reverse('users:profile')}#reset-password")
 
 